@@ -4,11 +4,13 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy import func,case
 from sqlalchemy.orm import Session
 from fastapi.responses import StreamingResponse
-from database import get_db
-from models import Attendance, User,TeacherSubject
+from database import get_db, get_read_db, replica_status, route_to_branch, DB_SHARDS
+from models import Attendance, User,TeacherSubject, Subject
 from schemas import CreateTeacherRequest,AssignTeacherSubjectRequest
 from utils import get_password_hash
-from check_user import admin_only
+from check_user import admin_only, invalidate_user, bump_token_version, user_cache, token_versions
+import lookups
+from sharding import for_each_shard
 from fastapi.responses import FileResponse
 import pandas as pd
 import os
@@ -21,7 +23,15 @@ from sqlalchemy.orm import Session
 from database import get_db
 from models import User
 from schemas import LoginSchema
-from utils import verify_password
+from utils import user_token_claims, token_cache, BCRYPT_ROUNDS
+from login_pipeline import find_account, check_password, pool_stats
+from metrics import hash_latency, hash_queue_wait, verify_latency
+from mark_buffer import mark_buffer
+from attendance_cleanup import expiry_scheduler
+from session_index import active_sessions
+from qr_generator import qr_cache
+from roster_cache import roster_cache
+from fastapi.concurrency import run_in_threadpool
 from auth import create_access_token
 
 router = APIRouter(
@@ -33,11 +43,11 @@ router = APIRouter(
 # 🔐 STAFF LOGIN (ADMIN + TEACHER)
 # =====================================================
 @router.post("/login")
-def staff_login(
+async def staff_login(
     data: LoginSchema,
     db: Session = Depends(get_db)
 ):
-    user = db.query(User).filter(User.mobile == data.mobile).first()
+    user = await run_in_threadpool(find_account, db, data.mobile)
 
     if not user or user.role not in ["admin", "teacher"]:
         raise HTTPException(
@@ -45,16 +55,13 @@ def staff_login(
             detail="Not a staff account"
         )
 
-    if not verify_password(data.password, user.hashed_password):
+    if not await check_password(db, user, data.password):
         raise HTTPException(
             status_code=401,
             detail="Invalid credentials"
         )
 
-    access_token = create_access_token({
-        "user_id": user.id,
-        "role": user.role
-    })
+    access_token = create_access_token(user_token_claims(user))
 
     return {
         "access_token": access_token,
@@ -64,27 +71,43 @@ def staff_login(
 
 
 
+# =====================================================
+# 🔀 CROSS-BRANCH READS (fan out over shards when DB_SHARDS is set)
+# =====================================================
+def _across_branches(db: Session, fn):
+    return for_each_shard(fn) if DB_SHARDS else [fn(db)]
+
+
+def _teacher_shard(db: Session, teacher_id: int):
+    # teacher subjects live in the teacher's branch shard
+    if DB_SHARDS:
+        route_to_branch(db, db.query(User.branch).filter(User.id == teacher_id).scalar())
+
+
 @router.get("/attendance")
 def get_all_attendance(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     admin=Depends(admin_only)
 ):
-    records = (
-        db.query(Attendance, User.name, User.mobile)
-        .join(User, User.id == Attendance.student_id)
-        .all()
-    )
+    def fetch(db: Session):
+        records = (
+            db.query(Attendance, User.name, User.mobile)
+            .join(User, User.id == Attendance.student_id)
+            .all()
+        )
 
-    return [
-        {
-            "student_name": name,
-            "mobile": mobile,
-            "subject": attendance.subject,
-            "date": attendance.date,
-            "status": attendance.status,
-        }
-        for attendance, name, mobile in records
-    ]
+        return [
+            {
+                "student_name": name,
+                "mobile": mobile,
+                "subject": attendance.subject,
+                "date": attendance.date,
+                "status": attendance.status,
+            }
+            for attendance, name, mobile in records
+        ]
+
+    return [row for part in _across_branches(db, fetch) for row in part]
 
 
 # Export attendance to Excel
@@ -94,32 +117,34 @@ def get_all_attendance(
 def export_attendance(
     start_date: str,
     end_date: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     admin=Depends(admin_only)
 ):
-    records = (
-    db.query(
-        Attendance,
-        User.name.label("student_name"),
-        User.mobile.label("student_mobile")
-    )
-    .join(User, User.id == Attendance.student_id)
-    .filter(Attendance.date.between(start_date, end_date))
-    .all()
-)
+    def fetch(db: Session):
+        records = (
+            db.query(
+                Attendance,
+                User.name.label("student_name"),
+                User.mobile.label("student_mobile")
+            )
+            .join(User, User.id == Attendance.student_id)
+            .filter(Attendance.date.between(start_date, end_date))
+            .all()
+        )
 
+        return [
+            {
+                "Student ID": attendance.student_id,
+                "Student Name": student_name,
+                "Mobile": student_mobile,
+                "Subject": attendance.subject,
+                "Date": attendance.date,
+                "Status": attendance.status,
+            }
+            for attendance, student_name, student_mobile in records
+        ]
 
-    data = [
-    {
-        "Student ID": attendance.student_id,
-        "Student Name": student_name,
-        "Mobile": student_mobile,
-        "Subject": attendance.subject,
-        "Date": attendance.date,
-        "Status": attendance.status,
-    }
-    for attendance, student_name, student_mobile in records
-]
+    data = [row for part in _across_branches(db, fetch) for row in part]
 
 
     df = pd.DataFrame(data)
@@ -158,7 +183,10 @@ def promote_to_teacher(
         )
 
     user.role = "teacher"
+    bump_token_version(db, user.id)
     db.commit()
+    invalidate_user(user.id)
+    roster_cache.invalidate(user.branch, user.year)
 
     return {
         "message": "User promoted to teacher",
@@ -172,15 +200,13 @@ def get_students(
 ):
     return db.query(User).filter(User.role == "student").all()
 
-@router.get("/attendance/analytics")
-def attendance_analytics(
-    start_date: str,
-    end_date: str,
-    db: Session = Depends(get_db),
-    admin=Depends(admin_only)
-):
+def _analytics_counts(db: Session, start_date: str, end_date: str) -> dict:
+    """
+    Raw present / total counts for one database; percentages are computed
+    after merging so shards combine correctly.
+    """
     # -----------------------
-    # Daily attendance %
+    # Daily attendance
     # -----------------------
     daily = (
         db.query(
@@ -192,42 +218,26 @@ def attendance_analytics(
         )
         .filter(Attendance.date.between(start_date, end_date))
         .group_by(Attendance.date)
-        .order_by(Attendance.date)
         .all()
     )
 
-    daily_attendance = [
-        {
-            "date": str(d.date),
-            "percentage": round((d.present / d.total) * 100, 2),
-        }
-        for d in daily
-    ]
-
     # -----------------------
-    # Subject-wise attendance %
+    # Subject-wise attendance
     # -----------------------
     subjects = (
         db.query(
-            Attendance.subject.label("subject"),
+            Subject.name.label("subject"),
             func.count().label("total"),
             func.sum(
                 case((Attendance.status == "present", 1), else_=0)
             ).label("present"),
         )
+        .join(Subject, Subject.id == Attendance.subject_id)
         .filter(Attendance.date.between(start_date, end_date))
-        .group_by(Attendance.subject)
+        .group_by(Attendance.subject_id, Subject.name)
         .all()
     )
 
-    subject_wise = [
-        {
-            "subject": s.subject,
-            "percentage": round((s.present / s.total) * 100, 2),
-        }
-        for s in subjects
-    ]
-
     # -----------------------
     # Overall present vs absent
     # -----------------------
@@ -241,11 +251,53 @@ def attendance_analytics(
     )
 
     return {
-        "daily_attendance": daily_attendance,
-        "subject_wise": subject_wise,
+        "daily": [(str(d.date), d.total, d.present) for d in daily],
+        "subjects": [(s.subject, s.total, s.present) for s in subjects],
+        "present": overall[0] or 0,
+        "absent": overall[1] or 0,
+    }
+
+
+def _merge_counts(rows) -> dict:
+    merged = {}
+    for key, total, present in rows:
+        t, p = merged.get(key, (0, 0))
+        merged[key] = (t + total, p + present)
+    return merged
+
+
+@router.get("/attendance/analytics")
+def attendance_analytics(
+    start_date: str,
+    end_date: str,
+    db: Session = Depends(get_read_db),
+    admin=Depends(admin_only)
+):
+    parts = _across_branches(
+        db, lambda db: _analytics_counts(db, start_date, end_date)
+    )
+
+    daily = _merge_counts(row for part in parts for row in part["daily"])
+    subjects = _merge_counts(row for part in parts for row in part["subjects"])
+
+    return {
+        "daily_attendance": [
+            {
+                "date": day,
+                "percentage": round((present / total) * 100, 2),
+            }
+            for day, (total, present) in sorted(daily.items())
+        ],
+        "subject_wise": [
+            {
+                "subject": subject,
+                "percentage": round((present / total) * 100, 2),
+            }
+            for subject, (total, present) in subjects.items()
+        ],
         "overall": {
-            "present": overall[0] or 0,
-            "absent": overall[1] or 0,
+            "present": sum(part["present"] for part in parts),
+            "absent": sum(part["absent"] for part in parts),
         },
     }
 @router.delete("/users/{user_id}")
@@ -262,11 +314,45 @@ def delete_user(
     if user.role == "admin":
         raise HTTPException(status_code=400, detail="Cannot delete admin")
 
+    branch, year = user.branch, user.year
+
+    # row is gone → version lookup fails → outstanding tokens are rejected
     db.delete(user)
     db.commit()
+    invalidate_user(user_id)
+    roster_cache.invalidate(branch, year)
 
     return {"message": "User deleted"}
 
+@router.put("/users/{user_id}/active")
+def set_user_active(
+    user_id: int,
+    is_active: bool,
+    db: Session = Depends(get_db),
+    admin=Depends(admin_only)
+):
+    user = db.query(User).filter(User.id == user_id).first()
+
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    if user.role == "admin":
+        raise HTTPException(status_code=400, detail="Cannot deactivate admin")
+
+    user.is_active = is_active
+
+    if not is_active:
+        bump_token_version(db, user.id)
+
+    db.commit()
+    invalidate_user(user.id)
+    roster_cache.invalidate(user.branch, user.year)
+
+    return {
+        "message": "User activated" if is_active else "User deactivated",
+        "user_id": user.id
+    }
+
 @router.get("/users")
 def get_users(
     db: Session = Depends(get_db),
@@ -293,16 +379,8 @@ def get_users_by_branch(
     db: Session = Depends(get_db),
     admin=Depends(admin_only)
 ):
-    # Students → branch + year
-    student_query = db.query(User).filter(
-        User.role == "student",
-        User.branch == branch
-    )
-
-    if year is not None:
-        student_query = student_query.filter(User.year == year)
-
-    students = student_query.all()
+    # Students → branch + year (inactive ones included)
+    students = roster_cache.get(db, branch, year)
 
     # Teachers → branch ONLY
     teachers = db.query(User).filter(
@@ -313,10 +391,7 @@ def get_users_by_branch(
     return {
         "branch": branch,
         "year": year,
-        "students": [
-            {"id": s.id, "name": s.name, "mobile": s.mobile}
-            for s in students
-        ],
+        "students": students.as_list(active_only=False, mobile=True),
         "teachers": [
             {"id": t.id, "name": t.name, "mobile": t.mobile}
             for t in teachers
@@ -403,7 +478,10 @@ def demote_to_student(
     if year:
         user.year = year
 
+    bump_token_version(db, user.id)
     db.commit()
+    invalidate_user(user.id)
+    roster_cache.invalidate(user.branch, user.year)
 
     return {
         "message": "Teacher demoted back to student",
@@ -456,6 +534,8 @@ def assign_subject(
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher not found")
 
+    route_to_branch(db, teacher.branch)
+
     # ❌ Prevent duplicate
     exists = db.query(TeacherSubject).filter(
         TeacherSubject.teacher_id == teacher_id,
@@ -473,7 +553,9 @@ def assign_subject(
         teacher_id=teacher_id,
         subject=payload.subject,
         year=payload.year,
-        branch=teacher.branch  # ✅ FIX HERE
+        branch=teacher.branch,  # ✅ FIX HERE
+        subject_id=lookups.subject_id(db, payload.subject, create=True),
+        class_id=lookups.class_id(db, teacher.branch, payload.year, create=True)
     )
 
     db.add(ts)
@@ -502,6 +584,8 @@ def get_teacher_subjects(
     db: Session = Depends(get_db),
     admin=Depends(admin_only)
 ):
+    _teacher_shard(db, teacher_id)
+
     subjects = db.query(TeacherSubject).filter(
         TeacherSubject.teacher_id == teacher_id
     ).all()
@@ -522,6 +606,8 @@ def get_teacher_subjects(
     db: Session = Depends(get_db),
     admin=Depends(admin_only)
 ):
+    _teacher_shard(db, teacher_id)
+
     subjects = db.query(TeacherSubject).filter(
         TeacherSubject.teacher_id == teacher_id
     ).all()
@@ -539,9 +625,19 @@ def get_teacher_subjects(
 @router.delete("/teachers/subjects/{subject_id}")
 def delete_teacher_subject(
     subject_id: int,
+    branch: str | None = None,
     db: Session = Depends(get_db),
     admin=Depends(admin_only)
 ):
+    # ids are per shard → the branch says which one
+    if DB_SHARDS:
+        if not branch:
+            raise HTTPException(
+                status_code=400,
+                detail="branch is required when sharding is enabled"
+            )
+        route_to_branch(db, branch)
+
     subject = db.query(TeacherSubject).filter(
         TeacherSubject.id == subject_id
     ).first()
@@ -572,8 +668,12 @@ def change_teacher_branch(
     if not teacher:
         raise HTTPException(404, "Teacher not found")
 
+    # old subjects live in the old branch's shard
+    route_to_branch(db, teacher.branch)
+
     # 1️⃣ Update branch
     teacher.branch = branch
+    bump_token_version(db, teacher.id)
 
     # 2️⃣ Remove old subject assignments
     db.query(TeacherSubject).filter(
@@ -581,11 +681,59 @@ def change_teacher_branch(
     ).delete()
 
     db.commit()
+    invalidate_user(teacher.id)
 
     return {
         "message": "Teacher branch updated. Subjects cleared."
     }
 
+# =====================================================
+# 📈 PASSWORD HASHING METRICS
+# =====================================================
+@router.get("/metrics/hashing")
+def hashing_metrics(admin=Depends(admin_only)):
+    return {
+        "bcrypt_rounds": BCRYPT_ROUNDS,
+        "hash": hash_latency.stats(),
+        "verify": verify_latency.stats(),
+        "queue_wait": hash_queue_wait.stats(),
+        "login_pool": pool_stats()
+    }
+
+@router.get("/metrics/replica")
+def replica_metrics(admin=Depends(admin_only)):
+    return replica_status()
+
+# =====================================================
+# 📝 ATTENDANCE MARK BUFFER
+# =====================================================
+@router.get("/metrics/marks")
+def mark_buffer_metrics(admin=Depends(admin_only)):
+    return mark_buffer.stats()
+
+# =====================================================
+# ⏱️ ATTENDANCE SESSION EXPIRY
+# =====================================================
+@router.get("/metrics/sessions")
+def session_expiry_metrics(admin=Depends(admin_only)):
+    return {
+        "indexed_active": len(active_sessions),
+        "expiry": expiry_scheduler.stats()
+    }
+
+# =====================================================
+# 📈 IN-PROCESS CACHE STATS
+# =====================================================
+@router.get("/cache/stats")
+def cache_stats(admin=Depends(admin_only)):
+    return {
+        "users": user_cache.stats(),
+        "token_versions": token_versions.stats(),
+        "tokens": token_cache.stats(),
+        "qr": qr_cache.stats(),
+        "rosters": roster_cache.stats()
+    }
+
 @router.options("/{path:path}")
 def admin_options_handler(path: str):
     return {}
@@ -1,14 +1,38 @@
-from datetime import datetime
+"""
+Attendance session expiry.
+
+start_attendance schedules every new session here; a background thread
+keeps a min-heap of deadlines and flips `is_active` off when they pass,
+so queries for active sessions can filter on `is_active` alone. Wake-ups
+are rounded up to SESSION_EXPIRY_TICK seconds and everything due in the
+same tick is deactivated with one UPDATE per shard. On startup sessions
+that expired while the server was down are closed and the rest are
+re-scheduled from the database.
+"""
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
 from sqlalchemy.orm import Session
 
+from database import SessionLocal, route_to_branch, shard_for
 from models import AttendanceSession
+from session_index import active_sessions
+from sharding import for_each_shard
 
+SESSION_EXPIRY_TICK = float(os.getenv("SESSION_EXPIRY_TICK", "1"))
+SESSION_EXPIRY_RETRY = 5.0
 
-def close_expired_sessions(db: Session):
+
+def close_expired_sessions(db: Session) -> int:
     """
     Marks all expired attendance sessions as inactive
     """
-    db.query(AttendanceSession).filter(
+    closed = db.query(AttendanceSession).filter(
         AttendanceSession.is_active == True,
         AttendanceSession.expires_at < datetime.utcnow()
     ).update(
@@ -16,3 +40,145 @@ def close_expired_sessions(db: Session):
         synchronize_session=False
     )
     db.commit()
+    return closed
+
+
+def _timestamp(moment: datetime) -> float:
+    # expires_at is naive UTC
+    return moment.replace(tzinfo=timezone.utc).timestamp()
+
+
+class ExpiryScheduler:
+    def __init__(self, tick: float):
+        self.tick = tick
+        # (expires_at, seq, session_id, branch): seq breaks ties before the
+        # id (ids repeat across shards) and the branch (str vs None)
+        self._heap: list[tuple[datetime, int, int, str | None]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+        self._stats = {"scheduled": 0, "batches": 0, "deactivated": 0, "failed": 0}
+
+    def schedule(self, session_id: int, branch: str | None, expires_at: datetime):
+        with self._cond:
+            seq = next(self._seq)
+            heapq.heappush(self._heap, (expires_at, seq, session_id, branch))
+            self._stats["scheduled"] += 1
+            if self._heap[0][1] == seq:
+                # new earliest deadline → re-arm the timer
+                self._cond.notify()
+
+    def _wake_at(self, expires_at: datetime) -> float:
+        # round up to the tick so deadlines close together share one batch
+        return math.ceil(_timestamp(expires_at) / self.tick) * self.tick
+
+    def _next_batch(self) -> list[tuple] | None:
+        with self._cond:
+            while not self._stopping:
+                timeout = None
+                if self._heap:
+                    timeout = self._wake_at(self._heap[0][0]) - time.time()
+                    if timeout <= 0:
+                        break
+                self._cond.wait(timeout)
+
+            if self._stopping:
+                return None
+
+            now = datetime.utcnow()
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap))
+            return due
+
+    def _run(self):
+        while (due := self._next_batch()) is not None:
+            if due:
+                self._expire(due)
+
+    def _expire(self, due: list[tuple]):
+        by_shard: dict[str | None, list[tuple]] = {}
+        for entry in due:
+            by_shard.setdefault(shard_for(entry[3]), []).append(entry)
+
+        for shard, entries in by_shard.items():
+            ids = [session_id for _, _, session_id, _ in entries]
+            try:
+                with SessionLocal() as db:
+                    route_to_branch(db, shard)
+                    closed = db.query(AttendanceSession).filter(
+                        AttendanceSession.id.in_(ids),
+                        AttendanceSession.is_active == True
+                    ).update(
+                        {AttendanceSession.is_active: False},
+                        synchronize_session=False
+                    )
+                    db.commit()
+            except Exception as e:
+                self._stats["failed"] += len(ids)
+                print(f"⚠️ Session expiry failed ({len(ids)} sessions), retrying:", e)
+                retry_at = datetime.utcnow() + timedelta(seconds=SESSION_EXPIRY_RETRY)
+                for _, _, session_id, branch in entries:
+                    self.schedule(session_id, branch, retry_at)
+                continue
+
+            for _, _, session_id, branch in entries:
+                active_sessions.evict(branch, session_id)
+
+            self._stats["batches"] += 1
+            self._stats["deactivated"] += closed
+
+    def recover(self):
+        """
+        Close sessions that expired while we were down, schedule the rest.
+        """
+        def load(db: Session):
+            close_expired_sessions(db)
+            return db.query(
+                AttendanceSession.id,
+                AttendanceSession.branch,
+                AttendanceSession.expires_at
+            ).filter(
+                AttendanceSession.is_active == True,
+                AttendanceSession.expires_at.isnot(None)
+            ).all()
+
+        for rows in for_each_shard(load):
+            for session_id, branch, expires_at in rows:
+                self.schedule(session_id, branch, expires_at)
+
+    def start(self):
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="session-expiry", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "pending": len(self._heap),
+                "next_expiry": self._heap[0][0] if self._heap else None,
+                "tick_seconds": self.tick,
+                **self._stats,
+            }
+
+
+expiry_scheduler = ExpiryScheduler(SESSION_EXPIRY_TICK)
+
+
+def start_expiry_scheduler():
+    expiry_scheduler.recover()
+    expiry_scheduler.start()
+
+
+def stop_expiry_scheduler():
+    expiry_scheduler.stop()
@@ -0,0 +1,77 @@
+"""
+In-process pub/sub for the live attendance feed (teacher SSE stream).
+
+mark_attendance publishes one event per committed mark; every teacher tab
+watching that session has its own queue and receives it without polling.
+start_attendance publishes "closed" to sessions it deactivates.
+
+Subscriptions are keyed by `session_key(branch, session_id)`: with
+DB_SHARDS session ids repeat across branches, and a bare id would hand
+one branch's marks to another branch's teacher.
+
+Publishing is thread-safe (sync routes run in the threadpool): events are
+handed to each subscriber's event loop with call_soon_threadsafe.
+
+The feed is per process — with several workers, marks handled by another
+worker are not pushed (run one worker or pin the teacher to one).
+"""
+import asyncio
+import json
+import os
+import threading
+
+FEED_HEARTBEAT_SECONDS = float(os.getenv("ATTENDANCE_FEED_HEARTBEAT", "15"))
+
+SessionKey = tuple[str | None, int]   # (shard, session_id)
+
+
+class AttendanceFeed:
+    def __init__(self):
+        self._subscribers: dict[SessionKey, dict[asyncio.Queue, asyncio.AbstractEventLoop]] = {}
+        self._lock = threading.Lock()
+        self._published = 0
+
+    def subscribe(self, key: SessionKey) -> asyncio.Queue:
+        # unbounded: events per session are capped by the class size
+        queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.setdefault(key, {})[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, key: SessionKey, queue: asyncio.Queue):
+        with self._lock:
+            watchers = self._subscribers.get(key, {})
+            watchers.pop(queue, None)
+            if not watchers:
+                self._subscribers.pop(key, None)
+
+    def publish(self, key: SessionKey, event: dict):
+        with self._lock:
+            watchers = list(self._subscribers.get(key, {}).items())
+
+        for queue, loop in watchers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # loop already closed (shutdown) → subscriber is gone
+                self.unsubscribe(key, queue)
+
+        self._published += 1
+
+    def close(self, key: SessionKey, reason: str):
+        self.publish(key, {"event": "closed", "reason": reason})
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._subscribers),
+                "subscribers": sum(len(w) for w in self._subscribers.values()),
+                "published": self._published,
+            }
+
+
+attendance_feed = AttendanceFeed()
+
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -0,0 +1,145 @@
+"""
+Single write path for attendance rows (QR marks, buffered marks, manual).
+
+    result = write_attendance(db, rows, overwrite=False)
+    result.inserted / result.updated / result.skipped   → (student_id, subject_id, date)
+
+Rows go in with INSERT ... ON CONFLICT (student_id, subject_id, date)
+DO NOTHING RETURNING, so there is no SELECT before the write and no race
+between check and insert. With overwrite=True the conflicting rows whose
+status differs are then updated set-wise (one UPDATE per subject and date,
+status picked by a CASE on student_id); rows already holding that status
+are reported as skipped. The caller commits.
+"""
+from dataclasses import dataclass, field
+from datetime import date
+
+from sqlalchemy import case, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models import Attendance
+
+# 4 bound parameters per row; stays far below SQLite's variable limit
+CHUNK_ROWS = 1000
+
+CONFLICT_COLUMNS = ["student_id", "subject_id", "date"]
+
+_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+Key = tuple[int, int, date]
+
+
+@dataclass
+class AttendanceWriteResult:
+    inserted: list[Key] = field(default_factory=list)
+    updated: list[Key] = field(default_factory=list)
+    skipped: list[Key] = field(default_factory=list)
+
+
+def attendance_row(student_id: int, subject_id: int, day: date, status: str = "present") -> dict:
+    return {"student_id": student_id, "subject_id": subject_id, "date": day, "status": status}
+
+
+def _key(row: dict) -> Key:
+    return (row["student_id"], row["subject_id"], row["date"])
+
+
+def _dedupe(rows: list[dict]) -> list[dict]:
+    # last status wins for repeated keys within one call
+    return list({_key(r): r for r in rows}.values())
+
+
+def _insert_statements(dialect: str, rows: list[dict]):
+    if dialect not in _INSERTS:
+        raise RuntimeError(f"attendance upsert not supported on {dialect}")
+
+    insert = _INSERTS[dialect]
+    for i in range(0, len(rows), CHUNK_ROWS):
+        yield (
+            insert(Attendance)
+            .values(rows[i:i + CHUNK_ROWS])
+            .on_conflict_do_nothing(index_elements=CONFLICT_COLUMNS)
+            .returning(Attendance.student_id, Attendance.subject_id, Attendance.date)
+        )
+
+
+def _update_statements(rows: list[dict]):
+    """
+    One UPDATE per (subject, date), only where the status changes:
+    SET status = CASE student_id WHEN .. THEN .. END.
+    """
+    groups: dict[tuple, dict[int, str]] = {}
+    for r in rows:
+        groups.setdefault((r["subject_id"], r["date"]), {})[r["student_id"]] = r["status"]
+
+    for (subject_id, day), statuses in groups.items():
+        student_ids = list(statuses)
+        for i in range(0, len(student_ids), CHUNK_ROWS):
+            chunk = {sid: statuses[sid] for sid in student_ids[i:i + CHUNK_ROWS]}
+            new_status = case(chunk, value=Attendance.student_id)
+            yield (
+                update(Attendance)
+                .where(
+                    Attendance.subject_id == subject_id,
+                    Attendance.date == day,
+                    Attendance.student_id.in_(list(chunk)),
+                    Attendance.status != new_status
+                )
+                .values(status=new_status)
+                .returning(Attendance.student_id, Attendance.subject_id, Attendance.date)
+                .execution_options(synchronize_session=False)
+            )
+
+
+def _result(rows: list[dict], inserted: set, updated: set) -> AttendanceWriteResult:
+    result = AttendanceWriteResult()
+    for r in rows:
+        key = _key(r)
+        if key in inserted:
+            result.inserted.append(key)
+        elif key in updated:
+            result.updated.append(key)
+        else:
+            result.skipped.append(key)
+    return result
+
+
+def _dialect(db) -> str:
+    return db.get_bind(mapper=Attendance.__mapper__).dialect.name
+
+
+def write_attendance(db: Session, rows: list[dict], overwrite: bool = False) -> AttendanceWriteResult:
+    rows = _dedupe(rows)
+    inserted, updated = set(), set()
+
+    for stmt in _insert_statements(_dialect(db), rows):
+        inserted |= {tuple(r) for r in db.execute(stmt)}
+
+    if overwrite:
+        for stmt in _update_statements([r for r in rows if _key(r) not in inserted]):
+            updated |= {tuple(r) for r in db.execute(stmt)}
+
+    return _result(rows, inserted, updated)
+
+
+async def write_attendance_async(
+    db: AsyncSession,
+    rows: list[dict],
+    overwrite: bool = False
+) -> AttendanceWriteResult:
+    rows = _dedupe(rows)
+    inserted, updated = set(), set()
+
+    for stmt in _insert_statements(_dialect(db), rows):
+        inserted |= {tuple(r) for r in await db.execute(stmt)}
+
+    if overwrite:
+        for stmt in _update_statements([r for r in rows if _key(r) not in inserted]):
+            updated |= {tuple(r) for r in await db.execute(stmt)}
+
+    return _result(rows, inserted, updated)
@@ -1,129 +1,134 @@
+import os
 import random
-from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from database import get_db
-from models import User, OTPVerification
-from schemas import SendOTPRequest, RegisterRequest, VerifyOTPRequest
-from utils import get_password_hash, verify_password, create_access_token
+from models import User
+from schemas import SendOTPRequest, RegisterRequest, VerifyOTPRequest, ResetPasswordRequest
+from check_user import bump_token_version, invalidate_user
+from roster_cache import roster_cache
+from otp_store import otp_store, send_limiter, verify_limiter
+from login_pipeline import find_account, check_password
+from utils import get_password_hash, create_access_token, user_token_claims
 
 router = APIRouter(tags=["Auth"])
 
+# no SMS gateway yet → the OTP can be echoed back for local development only
+DEV_OTP_ECHO = os.getenv("DEV_OTP_ECHO", "false").lower() in ("1", "true", "yes")
+
+# staff accounts have no out-of-band channel to prove the OTP reached them
+RESETTABLE_ROLES = ("student",)
+
 
 # ================= LOGIN (ADMIN + TEACHER + STUDENT) =================
 @router.post("/token")
-def token_login(data: dict, db: Session = Depends(get_db)):
+async def token_login(data: dict, db: Session = Depends(get_db)):
     mobile = data.get("mobile")
     password = data.get("password")
 
     if not mobile or not password:
         raise HTTPException(status_code=400, detail="Mobile and password required")
 
-    # ================= ADMIN LOGIN (✅ ADDED) =================
-    admin = db.query(User).filter(
-        User.mobile == mobile,
-        User.role == "admin",
-        User.is_active == True
-    ).first()
+    # one lookup for every role, bcrypt on the login pool
+    user = await run_in_threadpool(find_account, db, mobile)
 
-    if admin and verify_password(password, admin.hashed_password):
-        token = create_access_token({
-            "user_id": admin.id,
-            "role": "admin",
-            "branch": admin.branch
-        })
+    if not user or not await check_password(db, user, password):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
 
-        return {
-            "access_token": token,
-            "role": "admin"
-        }
+    token = create_access_token(user_token_claims(user))
 
-    # ================= TEACHER LOGIN =================
-    teacher = db.query(User).filter(
-        User.mobile == mobile,
-        User.role == "teacher",
-        User.is_active == True
-    ).first()
+    return {
+        "access_token": token,
+        "role": user.role
+    }
 
-    if teacher and verify_password(password, teacher.hashed_password):
-        token = create_access_token({
-            "user_id": teacher.id,
-            "role": "teacher",
-            "branch": teacher.branch
-        })
 
-        return {
-            "access_token": token,
-            "role": "teacher"
-        }
+# ================= OTP HELPERS =================
+def _rate_limited(limiter, mobile: str):
+    if not limiter.allow(mobile):
+        raise HTTPException(
+            status_code=429,
+            detail="Too many OTP requests, try again later",
+            headers={"Retry-After": str(limiter.retry_after(mobile))}
+        )
 
-    # ================= STUDENT LOGIN =================
-    student = db.query(User).filter(
-        User.mobile == mobile,
-        User.role == "student"
-    ).first()
 
-    if student and verify_password(password, student.hashed_password):
-        token = create_access_token({
-            "user_id": student.id,
-            "role": "student",
-            "branch": student.branch,
-            "year": student.year
-        })
+def _check_otp(mobile: str, otp: str):
+    _rate_limited(verify_limiter, mobile)
 
-        return {
-            "access_token": token,
-            "role": "student"
-        }
+    entry = otp_store.get(mobile)
 
-    raise HTTPException(status_code=401, detail="Invalid credentials")
+    if not entry or entry.otp != otp:
+        raise HTTPException(status_code=400, detail="Invalid OTP")
+
+    if entry.expired():
+        raise HTTPException(status_code=400, detail="OTP expired")
 
 
 # ================= SEND OTP =================
 @router.post("/auth/send-otp")
-def send_otp(data: SendOTPRequest, db: Session = Depends(get_db)):
-    otp = str(random.randint(100000, 999999))
+def send_otp(data: SendOTPRequest):
+    _rate_limited(send_limiter, data.mobile)
 
-    db.query(OTPVerification).filter_by(mobile=data.mobile).delete()
+    otp = str(random.randint(100000, 999999))
+    otp_store.put(data.mobile, otp)
 
-    db.add(
-        OTPVerification(
-            mobile=data.mobile,
-            otp=otp,
-            expires_at=datetime.utcnow() + timedelta(minutes=5)
-        )
-    )
-    db.commit()
+    if DEV_OTP_ECHO:
+        return {
+            "message": "OTP generated (DEV MODE)",
+            "otp": otp
+        }
 
-    # DEV MODE ONLY
-    return {
-        "message": "OTP generated (DEV MODE)",
-        "otp": otp
-    }
+    return {"message": "OTP sent"}
 
 
 # ================= VERIFY OTP =================
 @router.post("/auth/verify-otp")
-def verify_otp(data: VerifyOTPRequest, db: Session = Depends(get_db)):
-    otp_record = db.query(OTPVerification).filter_by(mobile=data.mobile).first()
+def verify_otp(data: VerifyOTPRequest):
+    _check_otp(data.mobile, data.otp)
+    otp_store.mark_verified(data.mobile)
 
-    if not otp_record or otp_record.otp != data.otp:
-        raise HTTPException(status_code=400, detail="Invalid OTP")
+    return {"message": "OTP verified"}
 
-    if otp_record.expires_at < datetime.utcnow():
-        raise HTTPException(status_code=400, detail="OTP expired")
 
-    return {"message": "OTP verified"}
+# ================= RESET PASSWORD =================
+@router.post("/auth/reset-password")
+def reset_password(data: ResetPasswordRequest, db: Session = Depends(get_db)):
+    _check_otp(data.mobile, data.otp)
+
+    user = db.query(User).filter(
+        User.mobile == data.mobile,
+        User.is_active == True
+    ).first()
+
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    if user.role not in RESETTABLE_ROLES:
+        raise HTTPException(
+            status_code=403,
+            detail="Password reset is not available for this account, contact an administrator"
+        )
+
+    user.hashed_password = get_password_hash(data.new_password)
+    bump_token_version(db, user.id)   # log out every existing session
+    db.commit()
+    invalidate_user(user.id)
+
+    otp_store.delete(data.mobile)
+
+    return {"message": "Password reset successfully"}
 
 
 # ================= REGISTER STUDENT ONLY =================
 @router.post("/auth/register")
 def register_user(data: RegisterRequest, db: Session = Depends(get_db)):
-    otp_record = db.query(OTPVerification).filter_by(mobile=data.mobile).first()
+    entry = otp_store.get(data.mobile)
 
-    if not otp_record:
+    if not entry or not entry.verified or entry.expired():
         raise HTTPException(status_code=400, detail="OTP not verified")
 
     if db.query(User).filter_by(mobile=data.mobile).first():
@@ -150,16 +155,11 @@ def register_user(data: RegisterRequest, db: Session = Depends(get_db)):
     db.add(user)
     db.commit()
     db.refresh(user)
+    roster_cache.invalidate(user.branch, user.year)
 
-    db.delete(otp_record)
-    db.commit()
+    otp_store.delete(data.mobile)
 
-    token = create_access_token({
-        "user_id": user.id,
-        "role": "student",
-        "branch": user.branch,
-        "year": user.year
-    })
+    token = create_access_token(user_token_claims(user))
 
     return {
         "message": "User registered successfully",
@@ -0,0 +1,137 @@
+"""
+Side-by-side latency of the sync (threadpool) and async stacks under load.
+
+    python -m benchmarks.async_vs_sync --requests 2000 --concurrency 200
+
+Serves the student notes listing twice in-process: through the sync
+get_db/student_only stack and through the ported async route.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime
+
+fd, DB_PATH = tempfile.mkstemp(suffix=".db")
+os.close(fd)
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+import httpx  # noqa: E402
+from fastapi import Depends, FastAPI  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from check_user import student_only  # noqa: E402
+from database import Base, SessionLocal, async_engine, engine, get_db  # noqa: E402
+from metrics import LatencyStats  # noqa: E402
+from models import Notes, User  # noqa: E402
+from routes.notes import get_student_notes  # noqa: E402
+from utils import create_access_token, user_token_claims  # noqa: E402
+
+
+def seed(notes: int) -> str:
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        student = User(
+            mobile="9000000000",
+            hashed_password="x",
+            name="Bench Student",
+            dob="2000-01-01",
+            gender="Other",
+            branch="BCA",
+            year="1",
+            role="student"
+        )
+        db.add(student)
+        db.flush()
+
+        db.add_all(
+            Notes(
+                subject=f"Subject {i % 6}",
+                year="1",
+                branch="BCA",
+                filename=f"note_{i}.pdf",
+                file_path=f"uploads/notes/note_{i}.pdf",
+                uploaded_by=student.id,
+                created_at=datetime.utcnow()
+            )
+            for i in range(notes)
+        )
+        db.commit()
+        return create_access_token(user_token_claims(student))
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/sync/notes")
+    def sync_notes(
+        db: Session = Depends(get_db),
+        student=Depends(student_only)
+    ):
+        notes = db.query(Notes).filter(
+            Notes.branch == student.branch,
+            Notes.year == student.year
+        ).order_by(Notes.created_at.desc()).all()
+
+        return [
+            {"id": n.id, "subject": n.subject, "filename": n.filename, "uploaded_at": n.created_at}
+            for n in notes
+        ]
+
+    app.add_api_route("/async/notes", get_student_notes, methods=["GET"])
+    return app
+
+
+async def hammer(client, path: str, headers: dict, requests: int, concurrency: int) -> dict:
+    stats = LatencyStats(window=requests)
+    errors = 0
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with gate:
+            started = time.perf_counter()
+            r = await client.get(path, headers=headers)
+            stats.record(time.perf_counter() - started)
+            if r.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    return {"rps": round(requests / elapsed, 1), "errors": errors, **stats.stats()}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--notes", type=int, default=50)
+    args = parser.parse_args()
+
+    token = seed(args.notes)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'stack':<8}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+        for name, path in (("sync", "/sync/notes"), ("async", "/async/notes")):
+            await client.get(path, headers=headers)   # warm caches / pools
+            r = await hammer(client, path, headers, args.requests, args.concurrency)
+            print(
+                f"{name:<8}{r['rps']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}"
+                f"{r['p99_ms']:>9}{r['errors']:>8}"
+            )
+
+    await async_engine.dispose()
+    engine.dispose()
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(DB_PATH + suffix):
+            os.remove(DB_PATH + suffix)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,154 @@
+"""
+Row and index size of the attendance table: text subjects vs subject_id.
+
+    python -m benchmarks.attendance_encoding --rows 1000000
+
+Builds the same synthetic attendance data twice in SQLite — once in the
+layout before migration 4 (subject text) and once in the current layout
+(subject_id into subjects) — and reports per-table / per-index sizes from
+the dbstat virtual table, plus a timed subject-wise GROUP BY.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine
+
+from migrations import _attendance_encoded, _attendance_legacy, _subjects
+
+SUBJECTS = [
+    "Data Structures and Algorithms",
+    "Database Management Systems",
+    "Operating Systems",
+    "Computer Networks",
+    "Object Oriented Programming",
+    "Discrete Mathematics",
+    "Software Engineering",
+    "Theory of Computation",
+    "Web Technologies",
+    "Compiler Design",
+]
+
+
+def rows(count: int, students: int):
+    rng = random.Random(42)
+    start = date(2025, 1, 1)
+    seen = set()
+    while len(seen) < count:
+        key = (
+            rng.randint(1, students),
+            rng.randrange(len(SUBJECTS)),
+            start + timedelta(days=rng.randrange(365)),
+        )
+        if key not in seen:
+            seen.add(key)
+            yield key + ("present" if rng.random() < 0.8 else "absent",)
+
+
+def build(path: str, encoded: bool, data: list) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    if encoded:
+        _subjects.create(engine)
+        _attendance_encoded.create(engine)
+    else:
+        _attendance_legacy.create(engine)
+    engine.dispose()
+
+    conn = sqlite3.connect(path)
+    if encoded:
+        conn.executemany("INSERT INTO subjects (id, name) VALUES (?, ?)", enumerate(SUBJECTS, 1))
+        conn.executemany(
+            "INSERT INTO attendance (student_id, subject_id, date, status) VALUES (?, ?, ?, ?)",
+            ((s, subj + 1, d.isoformat(), st) for s, subj, d, st in data)
+        )
+    else:
+        conn.executemany(
+            "INSERT INTO attendance (student_id, subject, date, status) VALUES (?, ?, ?, ?)",
+            ((s, SUBJECTS[subj], d.isoformat(), st) for s, subj, d, st in data)
+        )
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+
+
+def measure(path: str, encoded: bool) -> dict:
+    conn = sqlite3.connect(path)
+    objects = dict(conn.execute(
+        "SELECT name, SUM(pgsize) FROM dbstat "
+        "WHERE name = 'attendance' OR name IN "
+        "(SELECT name FROM sqlite_master WHERE tbl_name = 'attendance' AND type = 'index') "
+        "GROUP BY name"
+    ).fetchall())
+    # sqlite_autoindex_attendance_1 is the (student, subject, date) unique constraint
+    count = conn.execute("SELECT COUNT(*) FROM attendance").fetchone()[0]
+    payload = conn.execute(
+        "SELECT SUM(payload) FROM dbstat WHERE name = 'attendance'"
+    ).fetchone()[0]
+
+    group_by = (
+        "SELECT s.name, COUNT(*) FROM attendance a JOIN subjects s ON s.id = a.subject_id "
+        "WHERE a.status = 'present' GROUP BY a.subject_id"
+        if encoded else
+        "SELECT subject, COUNT(*) FROM attendance WHERE status = 'present' GROUP BY subject"
+    )
+    started = time.perf_counter()
+    conn.execute(group_by).fetchall()
+    group_ms = (time.perf_counter() - started) * 1000
+    conn.close()
+
+    return {
+        "rows": count,
+        "table": objects.pop("attendance"),
+        "bytes_per_row": payload / count,
+        "indexes": objects,
+        "group_by_ms": group_ms,
+        "file": os.path.getsize(path),
+    }
+
+
+def mb(size: int) -> str:
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--students", type=int, default=5000)
+    args = parser.parse_args()
+
+    data = list(rows(args.rows, args.students))
+    results = {}
+
+    for name, encoded in (("text subject", False), ("subject_id", True)):
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        os.remove(path)
+        try:
+            build(path, encoded, data)
+            results[name] = measure(path, encoded)
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    for name, r in results.items():
+        print(f"\n== {name} ({r['rows']:,} rows, file {mb(r['file'])})")
+        print(f"   {'attendance':<32}{mb(r['table']):>10}   {r['bytes_per_row']:.1f} B/row payload")
+        for index, size in sorted(r["indexes"].items()):
+            print(f"   {index:<32}{mb(size):>10}")
+        print(f"   {'subject-wise GROUP BY':<32}{r['group_by_ms']:>7.1f} ms")
+
+    before, after = results["text subject"], results["subject_id"]
+    total_before = before["table"] + sum(before["indexes"].values())
+    total_after = after["table"] + sum(after["indexes"].values())
+    print(
+        f"\ntable + indexes: {mb(total_before)} → {mb(total_after)} "
+        f"({(1 - total_after / total_before) * 100:.0f}% smaller)"
+    )
+
+
+if __name__ == "__main__":
+    main()
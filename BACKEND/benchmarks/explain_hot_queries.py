@@ -0,0 +1,125 @@
+"""
+EXPLAIN QUERY PLAN for the hot route queries against DATABASE_URL (SQLite).
+
+    python -m benchmarks.explain_hot_queries
+
+Each query is built the way its route builds it and checked for the
+index it is expected to use (the composites come from migration 3).
+"""
+from sqlalchemy import func, select, text
+
+from database import engine
+from models import (
+    Assignment,
+    AssignmentSubmission,
+    Attendance,
+    AttendanceSession,
+    Notes,
+    TeacherSubject,
+    User,
+)
+
+HOT_QUERIES = [
+    (
+        "teacher_attendance_history.history_by_subject",
+        "ix_attendance_subject_date",
+        select(Attendance.date, func.count(Attendance.id))
+        .join(User, User.id == Attendance.student_id)
+        .where(
+            Attendance.subject_id == 1,
+            Attendance.status == "present",
+            User.branch == "BCA",
+            User.year == "1"
+        )
+        .group_by(Attendance.date),
+    ),
+    (
+        "student_attendance_history.student_attendance_summary",
+        # the unique (student_id, subject_id, date) index serves this equally well
+        ("ix_attendance_student_status", "sqlite_autoindex_attendance_1"),
+        select(Attendance.subject_id, func.count(Attendance.id))
+        .where(Attendance.student_id == 1, Attendance.status == "present")
+        .group_by(Attendance.subject_id),
+    ),
+    (
+        "student_assignment.list_student_assignments",
+        "ix_assignments_branch_year_due",
+        select(Assignment)
+        .where(Assignment.branch == "BCA", Assignment.year == "1")
+        .order_by(Assignment.due_date),
+    ),
+    (
+        "student_assignment.list_student_assignments (submission)",
+        "ix_submissions_assignment_student",
+        select(AssignmentSubmission)
+        .where(
+            AssignmentSubmission.assignment_id == 1,
+            AssignmentSubmission.student_id == 1
+        ),
+    ),
+    (
+        "notes.get_student_notes",
+        "ix_notes_branch_year_created",
+        select(Notes.id, Notes.subject, Notes.filename, Notes.created_at)
+        .where(Notes.branch == "BCA", Notes.year == "1")
+        .order_by(Notes.created_at.desc()),
+    ),
+    (
+        "teacher_attendance_history.verify_teacher_subject",
+        "ix_teacher_subjects_lookup",
+        select(TeacherSubject.id)
+        .where(
+            TeacherSubject.teacher_id == 1,
+            TeacherSubject.subject == "Maths",
+            TeacherSubject.year == "1",
+            TeacherSubject.branch == "BCA"
+        ),
+    ),
+    (
+        "manual_attendance.get_teacher_students",
+        "ix_users_role_branch_year",
+        select(User.id, User.name)
+        .where(
+            User.role == "student",
+            User.branch == "BCA",
+            User.year == "1",
+            User.is_active == True
+        )
+        .order_by(User.name),
+    ),
+    (
+        "teacher_attendance.start_attendance (deactivate old)",
+        "ix_sessions_teacher_active",
+        select(AttendanceSession.id)
+        .where(
+            AttendanceSession.teacher_id == 1,
+            AttendanceSession.is_active == True
+        ),
+    ),
+]
+
+
+def main():
+    if engine.dialect.name != "sqlite":
+        raise SystemExit("EXPLAIN QUERY PLAN report needs a SQLite DATABASE_URL")
+
+    missing = 0
+    with engine.connect() as conn:
+        for route, indexes, query in HOT_QUERIES:
+            if isinstance(indexes, str):
+                indexes = (indexes,)
+
+            sql = str(query.compile(engine, compile_kwargs={"literal_binds": True}))
+            plan = [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+            used = any(index in step for step in plan for index in indexes)
+            missing += not used
+
+            print(f"{'✅' if used else '❌'} {route}  [{' | '.join(indexes)}]")
+            for step in plan:
+                print(f"      {step}")
+
+    print(f"\n{len(HOT_QUERIES) - missing}/{len(HOT_QUERIES)} queries use their index")
+
+
+if __name__ == "__main__":
+    main()
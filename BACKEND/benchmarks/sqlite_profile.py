@@ -0,0 +1,125 @@
+"""
+Concurrent attendance-mark throughput: plain SQLite vs the production profile.
+
+    python -m benchmarks.sqlite_profile --students 2000 --threads 16
+
+Each mark does what student_attendance.mark_attendance does against the
+database: SELECT the existing row, INSERT, COMMIT.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import date
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, build_engine
+from models import Attendance, Subject, User
+
+
+def seed(engine, students: int):
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add_all(
+            User(
+                mobile=f"9{i:09d}",
+                hashed_password="x",
+                name=f"Student {i}",
+                dob="2000-01-01",
+                gender="Other",
+                branch="BCA",
+                year="1",
+                role="student"
+            )
+            for i in range(students)
+        )
+        subject = Subject(name="Maths")
+        db.add(subject)
+        db.commit()
+        return [u.id for u in db.query(User.id)], subject.id
+
+
+def run(profile: str, students: int, threads: int) -> dict:
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+
+    engine = build_engine(f"sqlite:///{path}", profile=profile)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    student_ids, subject_id = seed(engine, students)
+    today = date.today()
+
+    marked = 0
+    locked = 0
+    lock = threading.Lock()
+
+    def worker(ids):
+        nonlocal marked, locked
+        for student_id in ids:
+            with Session() as db:
+                try:
+                    exists = db.query(Attendance.id).filter(
+                        Attendance.student_id == student_id,
+                        Attendance.subject_id == subject_id,
+                        Attendance.date == today
+                    ).first()
+                    if not exists:
+                        db.add(Attendance(
+                            student_id=student_id,
+                            subject_id=subject_id,
+                            date=today,
+                            status="present"
+                        ))
+                        db.commit()
+                    with lock:
+                        marked += 1
+                except OperationalError:
+                    db.rollback()
+                    with lock:
+                        locked += 1
+
+    slices = [student_ids[i::threads] for i in range(threads)]
+    pool = [threading.Thread(target=worker, args=(s,)) for s in slices]
+
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    engine.dispose()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    return {
+        "profile": profile,
+        "marked": marked,
+        "locked": locked,
+        "seconds": round(elapsed, 2),
+        "marks_per_sec": round(marked / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    print(f"{'profile':<12}{'marked':>8}{'locked':>8}{'seconds':>10}{'marks/s':>10}")
+    for profile in ("default", "production"):
+        r = run(profile, args.students, args.threads)
+        print(
+            f"{r['profile']:<12}{r['marked']:>8}{r['locked']:>8}"
+            f"{r['seconds']:>10}{r['marks_per_sec']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Measure bcrypt verify latency per cost factor on this host and record
+the highest cost that stays under the target in hash_cost.json.
+
+    python calibrate_hash.py --target-ms 250
+
+utils.pwd_context picks the recorded cost up on next start; existing
+hashes are upgraded on the user's next login.
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime
+
+from passlib.hash import bcrypt
+
+from utils import HASH_COST_FILE
+
+
+def measure(rounds: int, samples: int) -> float:
+    hashed = bcrypt.using(rounds=rounds).hash("calibration-password")
+
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        bcrypt.verify("calibration-password", hashed)
+        timings.append(time.perf_counter() - started)
+
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--target-ms", type=float, default=250.0)
+    parser.add_argument("--min-rounds", type=int, default=10)
+    parser.add_argument("--max-rounds", type=int, default=14)
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    measured = {}
+    chosen = args.min_rounds
+
+    for rounds in range(args.min_rounds, args.max_rounds + 1):
+        ms = measure(rounds, args.samples)
+        measured[rounds] = round(ms, 2)
+        print(f"rounds={rounds:>2}  verify={ms:8.2f} ms")
+
+        if ms <= args.target_ms:
+            chosen = rounds
+        else:
+            break   # each step doubles the cost
+
+    print(f"✅ chosen bcrypt cost: {chosen} (target {args.target_ms} ms)")
+
+    if args.dry_run:
+        return
+
+    with open(HASH_COST_FILE, "w") as f:
+        json.dump(
+            {
+                "bcrypt_rounds": chosen,
+                "target_ms": args.target_ms,
+                "verify_ms": measured,
+                "calibrated_at": datetime.utcnow().isoformat()
+            },
+            f,
+            indent=2
+        )
+
+    print(f"📝 written to {HASH_COST_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,177 @@
+import os
+from dataclasses import dataclass
+
 from fastapi import Depends, HTTPException, Header
-from jose import jwt, JWTError
+from jose import JWTError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from database import get_db
+from database import get_db, get_async_db, route_to_branch
 from models import User
-from utils import SECRET_KEY, ALGORITHM
+from ttl_cache import TTLCache
+from utils import decode_access_token
 
 
 # =========================
-# GET CURRENT USER (JWT)
+# USER CACHE
 # =========================
-def get_current_user(
-    authorization: str = Header(None),
-    db: Session = Depends(get_db)
-):
+@dataclass(frozen=True)
+class CachedUser:
+    """
+    Detached snapshot of a `users` row (no password hash).
+    Exposes the same attributes routes read from the ORM User.
+    """
+    id: int
+    name: str
+    mobile: str
+    role: str
+    branch: str
+    year: str | None
+    is_active: bool
+
+
+user_cache = TTLCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "300")),
+)
+
+
+# =========================
+# CLAIMS MODE (NO DB ON AUTH PATH)
+# =========================
+# Opt-in: trust role / branch / year signed into the JWT and only check the
+# token version against a small in-memory map. The map TTL bounds how long
+# another worker process can keep accepting a revoked token.
+TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_CLAIMS", "false").lower() in ("1", "true", "yes")
+
+token_versions = TTLCache(
+    maxsize=int(os.getenv("TOKEN_VERSION_CACHE_SIZE", "8192")),
+    ttl=float(os.getenv("TOKEN_VERSION_CACHE_TTL", "60")),
+)
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    Identity rebuilt from verified token claims.
+    """
+    id: int
+    role: str
+    branch: str | None
+    year: str | None
+    name: str | None = None
+
+
+def invalidate_user(user_id: int):
+    """
+    Drop cached state for a user. Call after commit of any change to
+    role / branch / year / status.
+    """
+    user_cache.pop(user_id)
+    token_versions.pop(user_id)
+
+
+def bump_token_version(db: Session, user_id: int):
+    """
+    Revoke every token issued so far for the user.
+    Runs inside the caller's transaction; call invalidate_user after commit.
+    """
+    db.query(User).filter(User.id == user_id).update(
+        {User.token_version: User.token_version + 1},
+        synchronize_session=False
+    )
+
+
+def current_token_version(db: Session, user_id: int) -> int | None:
+    """
+    Live token version, or None when the user is gone or inactive.
+    """
+    version = token_versions.get(user_id)
+    if version is not None:
+        return version
+
+    version = (
+        db.query(User.token_version)
+        .filter(User.id == user_id, User.is_active == True)
+        .scalar()
+    )
+
+    if version is not None:
+        token_versions.set(user_id, version)
+
+    return version
+
+
+async def current_token_version_async(db: AsyncSession, user_id: int) -> int | None:
+    version = token_versions.get(user_id)
+    if version is not None:
+        return version
+
+    version = (
+        await db.execute(
+            select(User.token_version)
+            .where(User.id == user_id, User.is_active == True)
+        )
+    ).scalar()
+
+    if version is not None:
+        token_versions.set(user_id, version)
+
+    return version
+
+
+USER_COLUMNS = (
+    User.id,
+    User.name,
+    User.mobile,
+    User.role,
+    User.branch,
+    User.year,
+    User.is_active
+)
+
+
+def load_user(db: Session, user_id: int) -> CachedUser | None:
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    row = (
+        db.query(*USER_COLUMNS)
+        .filter(User.id == user_id)
+        .first()
+    )
+
+    if not row:
+        return None
+
+    user = CachedUser(**row._asdict())
+    user_cache.set(user_id, user)
+    return user
+
+
+async def load_user_async(db: AsyncSession, user_id: int) -> CachedUser | None:
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    row = (
+        await db.execute(select(*USER_COLUMNS).where(User.id == user_id))
+    ).first()
+
+    if not row:
+        return None
+
+    user = CachedUser(**row._asdict())
+    user_cache.set(user_id, user)
+    return user
+
+
+# =========================
+# RESOLVE IDENTITY (ONCE PER REQUEST)
+# =========================
+def decode_bearer(authorization: str | None) -> dict:
     print("AUTH HEADER:", authorization)
 
     if not authorization:
@@ -29,7 +187,7 @@ def get_current_user(
         raise HTTPException(status_code=401, detail="Missing or invalid token")
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         user_id = payload.get("user_id")
 
         if not user_id:
@@ -38,24 +196,74 @@ def get_current_user(
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    user = (
-        db.query(
-            User.id,
-            User.role,
-            User.branch,
-            User.year,
-            User.is_active
-        )
-        .filter(User.id == user_id)
-        .first()
+    return payload
+
+
+def _uses_claims(payload: dict) -> bool:
+    # tokens issued before claims mode → fall back to the user row
+    return TRUST_TOKEN_CLAIMS and "ver" in payload and "role" in payload
+
+
+def _principal(payload: dict, live_version: int | None) -> Principal:
+    if payload["ver"] != live_version:
+        raise HTTPException(status_code=401, detail="Token revoked")
+
+    return Principal(
+        id=payload["user_id"],
+        role=payload["role"],
+        branch=payload.get("branch"),
+        year=payload.get("year"),
+        name=payload.get("name")
     )
 
+
+def _active(user: CachedUser | None) -> CachedUser:
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
 
     if not user.is_active:
         raise HTTPException(status_code=403, detail="User inactive")
 
+    return user
+
+
+def get_identity(
+    authorization: str = Header(None),
+    db: Session = Depends(get_db)
+) -> CachedUser | Principal:
+    payload = decode_bearer(authorization)
+    user_id = payload["user_id"]
+
+    if _uses_claims(payload):
+        user = _principal(payload, current_token_version(db, user_id))
+    else:
+        user = _active(load_user(db, user_id))
+
+    # the rest of the request reads / writes this principal's branch shard
+    route_to_branch(db, user.branch)
+    return user
+
+
+async def get_identity_async(
+    authorization: str = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+) -> CachedUser | Principal:
+    payload = decode_bearer(authorization)
+    user_id = payload["user_id"]
+
+    if _uses_claims(payload):
+        user = _principal(payload, await current_token_version_async(db, user_id))
+    else:
+        user = _active(await load_user_async(db, user_id))
+
+    route_to_branch(db, user.branch)
+    return user
+
+
+# =========================
+# GET CURRENT USER (JWT)
+# =========================
+def get_current_user(user=Depends(get_identity)):
     return {
         "user_id": user.id,
         "role": user.role,
@@ -63,47 +271,47 @@ def get_current_user(
         "year": user.year
     }
 
-     
-
 
 # =========================
 # ROLE GUARDS
 # =========================
-def admin_only(user=Depends(get_current_user)):
-    if user["role"] != "admin":
+def admin_only(user=Depends(get_identity)):
+    if user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin only")
-    return user
 
+    return user  # ✅ cached User snapshot / Principal
 
-def teacher_only(
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
-):
-    user = (
-        db.query(User)
-        .filter(User.id == current_user["user_id"])
-        .first()
-    )
 
-    if not user or user.role != "teacher":
+def teacher_only(user=Depends(get_identity)):
+    if user.role != "teacher":
         raise HTTPException(status_code=403, detail="Not a teacher")
 
-    return user  # ✅ ORM User
+    return user  # ✅ cached User snapshot / Principal
 
 
+def student_only(user=Depends(get_identity)):
+    if user.role != "student":
+        raise HTTPException(status_code=403, detail="Student only")
 
-def student_only(
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
-):
-    user = (
-        db.query(User)
-        .filter(User.id == current_user["user_id"])
-        .first()
-    )
+    return user  # ✅ cached User snapshot / Principal
 
-    if not user or user.role != "student":
-        raise HTTPException(status_code=403, detail="Student only")
 
-    return user  # ✅ ORM User
+# =========================
+# ROLE GUARDS (ASYNC STACK)
+# =========================
+async def admin_only_async(user=Depends(get_identity_async)):
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin only")
+    return user
+
 
+async def teacher_only_async(user=Depends(get_identity_async)):
+    if user.role != "teacher":
+        raise HTTPException(status_code=403, detail="Not a teacher")
+    return user
+
+
+async def student_only_async(user=Depends(get_identity_async)):
+    if user.role != "student":
+        raise HTTPException(status_code=403, detail="Student only")
+    return user
@@ -1,24 +1,278 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import time
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.sql.util import find_tables
+from fastapi import Depends
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
 
-connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
+# "production" → WAL + tuned pragmas on every SQLite connection
+# "default"    → plain SQLite settings (rollback journal, synchronous=FULL)
+DB_PROFILE = os.getenv("DB_PROFILE", "production")
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536")),  # negative → KiB
+    "temp_store": "MEMORY",
+}
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def _pool_settings(url: str, kwargs: dict):
+    # in-memory SQLite uses a singleton pool without size settings
+    if url.startswith("sqlite") and ":memory:" in url:
+        return
+
+    kwargs.setdefault("pool_size", int(os.getenv("DB_POOL_SIZE", "10")))
+    kwargs.setdefault("max_overflow", int(os.getenv("DB_MAX_OVERFLOW", "20")))
+    kwargs.setdefault("pool_timeout", float(os.getenv("DB_POOL_TIMEOUT", "30")))
+    kwargs.setdefault("pool_recycle", int(os.getenv("DB_POOL_RECYCLE", "1800")))
+
+
+def build_engine(url: str, profile: str = DB_PROFILE, **kwargs):
+    """
+    Engine factory shared by the app and the scripts so every engine
+    gets the same connect args, pool settings and SQLite profile.
+    """
+    connect_args = {}
+    is_sqlite = url.startswith("sqlite")
+    if is_sqlite:
+        connect_args = {"check_same_thread": False}
+
+    _pool_settings(url, kwargs)
+
+    engine = create_engine(url, connect_args=connect_args, **kwargs)
+
+    if is_sqlite and profile == "production":
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+
+    return engine
+
+
+def to_async_url(url: str) -> str:
+    """
+    sqlite:// → sqlite+aiosqlite://, postgresql:// → postgresql+asyncpg://
+    """
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql+asyncpg://", 1)
+    return url
+
+
+def build_async_engine(url: str, profile: str = DB_PROFILE, **kwargs):
+    is_sqlite = url.startswith("sqlite")
+
+    _pool_settings(url, kwargs)
+
+    async_engine = create_async_engine(to_async_url(url), **kwargs)
+
+    if is_sqlite and profile == "production":
+        event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+
+    return async_engine
+
+
+engine = build_engine(DATABASE_URL)
+
+# async stack for I/O-bound routes; shares the same database
+async_engine = build_async_engine(os.getenv("ASYNC_DATABASE_URL", DATABASE_URL))
+
+# -----------------------------------
+# OPTIONAL SHARDING BY BRANCH
+# -----------------------------------
+# DB_SHARDS="BCA=sqlite:///./shards/bca.db,BBA=sqlite:///./shards/bba.db"
+#
+# DATABASE_URL stays the global database (users, OTPs, chat). The
+# branch-scoped tables below live in the shard of the principal's branch;
+# get_identity tags the request session with that branch and the routing
+# session picks the engine per statement. Branches without a shard keep
+# their data in the global database.
+#
+# Shards are SQLite files with the global database ATTACHed, so existing
+# joins against `users` keep working unchanged.
+DB_SHARDS = {
+    branch.strip(): url.strip()
+    for branch, _, url in (
+        item.partition("=") for item in os.getenv("DB_SHARDS", "").split(",")
+    )
+    if branch.strip() and url.strip()
+}
+
+SHARDED_TABLES = frozenset({
+    "attendance_sessions",
+    "attendance",
+    "notes",
+    "teacher_subjects",
+    "assignments",
+    "assignment_submissions",
+    "subjects",
+    "branches",
+    "classes",
+})
+
+if DB_SHARDS and not (
+    DATABASE_URL.startswith("sqlite")
+    and all(url.startswith("sqlite") for url in DB_SHARDS.values())
+):
+    raise RuntimeError("DB_SHARDS needs a SQLite DATABASE_URL and SQLite shard URLs")
+
+
+def _attach_global(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("ATTACH DATABASE ? AS global", (make_url(DATABASE_URL).database,))
+    cursor.close()
+
+
+def _build_shard(url: str, builder):
+    shard = builder(url)
+    event.listen(getattr(shard, "sync_engine", shard), "connect", _attach_global)
+    return shard
+
+
+shard_engines = {b: _build_shard(url, build_engine) for b, url in DB_SHARDS.items()}
+async_shard_engines = {b: _build_shard(url, build_async_engine) for b, url in DB_SHARDS.items()}
+
+
+def _touches_shard(mapper, clause) -> bool:
+    if mapper is not None and mapper.local_table.name in SHARDED_TABLES:
+        return True
+    if clause is None:
+        return False
+    return any(
+        t.name in SHARDED_TABLES
+        for t in find_tables(clause, check_columns=True, include_joins=True, include_crud=True)
+    )
+
+
+class BranchRoutedSession(Session):
+    """
+    Sends statements on SHARDED_TABLES to the shard of info["branch"].
+    """
+    shards = shard_engines
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        shard = self.shards.get(self.info.get("branch"))
+        if shard is not None and _touches_shard(mapper, clause):
+            return shard
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+class AsyncBranchRoutedSession(BranchRoutedSession):
+    shards = {b: e.sync_engine for b, e in async_shard_engines.items()}
+
+
+def route_to_branch(db, branch: str | None):
+    """
+    Point a (sync or async) session at the shard for `branch`.
+    """
+    db.info["branch"] = branch
+
+
+def shard_for(branch: str | None) -> str | None:
+    return branch if branch in DB_SHARDS else None
+
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+    **({"sync_session_class": AsyncBranchRoutedSession} if DB_SHARDS else {})
+)
 
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
-    bind=engine
+    bind=engine,
+    **({"class_": BranchRoutedSession} if DB_SHARDS else {})
 )
 
+# -----------------------------------
+# OPTIONAL READ REPLICA
+# -----------------------------------
+# Reporting / history endpoints read from here via get_read_db. When the
+# replica is missing or lags more than REPLICA_MAX_LAG_SECONDS they fall
+# back to the primary.
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL")
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "30"))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", "5"))
+
+read_engine = build_engine(READ_DATABASE_URL) if READ_DATABASE_URL else None
+
+ReadSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=read_engine
+) if read_engine else None
+
+_replica = {
+    "synced_at": None,     # set by replica_sync for the SQLite stand-in
+    "lag": None,
+    "checked_at": 0.0,
+    "reads": 0,
+    "fallbacks": 0,
+}
+
+
+def mark_replica_synced():
+    _replica["synced_at"] = time.time()
+
+
+def replica_lag() -> float | None:
+    """
+    Seconds behind the primary, or None when unknown / unreachable.
+    """
+    if read_engine is None:
+        return None
+
+    now = time.time()
+
+    if read_engine.dialect.name == "sqlite":
+        synced_at = _replica["synced_at"]
+        return None if synced_at is None else now - synced_at
+
+    if now - _replica["checked_at"] < REPLICA_LAG_CHECK_INTERVAL:
+        return _replica["lag"]
+
+    _replica["checked_at"] = now
+    try:
+        with read_engine.connect() as conn:
+            lag = conn.execute(text(
+                "SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+            )).scalar()
+        _replica["lag"] = float(lag)
+    except Exception:
+        _replica["lag"] = None
+
+    return _replica["lag"]
+
+
+def replica_status() -> dict:
+    return {
+        "configured": read_engine is not None,
+        "lag_seconds": replica_lag(),
+        "max_lag_seconds": REPLICA_MAX_LAG,
+        "reads": _replica["reads"],
+        "fallbacks": _replica["fallbacks"],
+    }
+
 Base = declarative_base()
 
 
@@ -28,3 +282,41 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def _replica_or_primary_db():
+    """
+    Replica when fresh; the primary session is only opened on fallback.
+    """
+    lag = replica_lag()
+
+    if lag is not None and lag <= REPLICA_MAX_LAG:
+        _replica["reads"] += 1
+        db = ReadSessionLocal()
+    else:
+        _replica["fallbacks"] += 1
+        db = SessionLocal()
+
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _primary_db(primary: Session = Depends(get_db)):
+    # the request's own session (shared with the auth guard)
+    return primary
+
+
+# Session for read-only endpoints. Without a replica, or when sharded (the
+# request's session carries the branch route), that is the primary session.
+get_read_db = (
+    _replica_or_primary_db
+    if ReadSessionLocal is not None and not DB_SHARDS
+    else _primary_db
+)
@@ -0,0 +1,127 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from metrics import hash_queue_wait, verify_latency
+from models import User
+from utils import verify_and_update_password
+
+# -----------------------------------
+# HASHING POOL + ADMISSION CONTROL
+# -----------------------------------
+# bcrypt runs in its own process pool so a login burst never holds the
+# anyio worker threads used by every other sync route.
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 2)))
+
+# logins allowed to wait for a free worker before we shed with 503
+HASH_MAX_WAITING = int(os.getenv("HASH_MAX_WAITING", str(HASH_WORKERS * 8)))
+
+# how long a queued login may wait for a worker (seconds)
+HASH_QUEUE_TIMEOUT = float(os.getenv("HASH_QUEUE_TIMEOUT", "3"))
+
+_executor: ProcessPoolExecutor | None = None
+_slots = asyncio.Semaphore(HASH_WORKERS)
+_waiting = 0
+_shed = 0
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _busy():
+    global _shed
+    _shed += 1
+    return HTTPException(
+        status_code=503,
+        detail="Login is busy, please retry",
+        headers={"Retry-After": "1"}
+    )
+
+
+async def run_hashing(fn, *args):
+    """
+    Run a hashing function on the pool, queueing up to HASH_QUEUE_TIMEOUT.
+    """
+    global _waiting
+
+    queued = time.perf_counter()
+    if _slots.locked():
+        if _waiting >= HASH_MAX_WAITING:
+            raise _busy()
+
+        _waiting += 1
+        try:
+            await asyncio.wait_for(_slots.acquire(), timeout=HASH_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise _busy()
+        finally:
+            _waiting -= 1
+    else:
+        await _slots.acquire()
+    hash_queue_wait.record(time.perf_counter() - queued)
+
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), fn, *args)
+    finally:
+        _slots.release()
+
+
+def pool_stats() -> dict:
+    return {
+        "workers": HASH_WORKERS,
+        "busy": HASH_WORKERS - _slots._value,
+        "waiting": _waiting,
+        "max_waiting": HASH_MAX_WAITING,
+        "shed": _shed,
+    }
+
+
+# -----------------------------------
+# LOGIN STEPS
+# -----------------------------------
+def find_account(db: Session, mobile: str) -> User | None:
+    """
+    Single lookup by the unique mobile number, whatever the role.
+    """
+    return (
+        db.query(User)
+        .filter(User.mobile == mobile, User.is_active == True)
+        .first()
+    )
+
+
+async def check_password(db: Session, user: User, password: str) -> bool:
+    """
+    Verify on the pool; transparently rehash when the stored cost is outdated.
+    """
+    ok, new_hash, seconds = await run_hashing(
+        verify_and_update_password, password, user.hashed_password
+    )
+    verify_latency.record(seconds)
+
+    if ok and new_hash:
+        await run_in_threadpool(_store_rehash, db, user, new_hash)
+
+    return ok
+
+
+def _store_rehash(db: Session, user: User, new_hash: str):
+    user.hashed_password = new_hash
+    db.commit()
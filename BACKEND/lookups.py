@@ -0,0 +1,90 @@
+"""
+Subject / branch / class dictionary ids.
+
+Names and (branch, year) pairs are resolved to their integer keys once and
+then served from memory; ids never change after the row is committed, so
+only rows read back from the database are cached (a row created in a
+transaction that later rolls back never reaches the cache). Each shard has
+its own lookup tables, so cache keys carry the shard. Two first-time
+requests for the same name race on the unique constraint; the loser's
+insert is rolled back to a savepoint and it uses the winner's row.
+"""
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import shard_for
+from models import Branch, Class, Subject
+
+_subject_ids: dict[tuple, int] = {}
+_branch_ids: dict[tuple, int] = {}
+_class_ids: dict[tuple, int] = {}
+
+
+def normalize_year(year: str | int) -> int:
+    # User.year is "1", StartAttendanceRequest.year is 1
+    try:
+        return int(str(year).strip())
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid year: {year!r}")
+
+
+def _get_or_create(db: Session, cache: dict, key, query, build, create: bool) -> int | None:
+    key = (shard_for(db.info.get("branch")), key)
+    if key in cache:
+        return cache[key]
+
+    row_id = query.scalar()
+    if row_id is not None:
+        cache[key] = row_id
+        return row_id
+
+    if not create:
+        return None
+
+    row = build()
+    try:
+        with db.begin_nested():
+            db.add(row)
+            db.flush()
+    except IntegrityError:
+        # created by a concurrent request since our SELECT → use theirs
+        row_id = query.scalar()
+        if row_id is None:
+            raise
+        cache[key] = row_id
+        return row_id
+
+    return row.id
+
+
+def subject_id(db: Session, name: str, create: bool = False) -> int | None:
+    return _get_or_create(
+        db, _subject_ids, name,
+        db.query(Subject.id).filter(Subject.name == name),
+        lambda: Subject(name=name),
+        create
+    )
+
+
+def branch_id(db: Session, name: str, create: bool = False) -> int | None:
+    return _get_or_create(
+        db, _branch_ids, name,
+        db.query(Branch.id).filter(Branch.name == name),
+        lambda: Branch(name=name),
+        create
+    )
+
+
+def class_id(db: Session, branch: str, year: str | int, create: bool = False) -> int | None:
+    year = normalize_year(year)
+    b_id = branch_id(db, branch, create)
+    if b_id is None:
+        return None
+
+    return _get_or_create(
+        db, _class_ids, (branch, year),
+        db.query(Class.id).filter(Class.branch_id == b_id, Class.year == year),
+        lambda: Class(branch_id=b_id, year=year),
+        create
+    )
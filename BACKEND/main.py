@@ -4,9 +4,18 @@ from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
 import os
 
-from database import Base, engine, get_db, SessionLocal
+from database import Base, engine, get_db, SessionLocal, async_engine, async_shard_engines
 from models import User, Attendance
 from utils import get_password_hash
+from login_pipeline import shutdown_executor
+from migrations import upgrade
+from otp_store import start_sweeper, stop_sweeper
+from replica_sync import start_replica_sync, stop_replica_sync
+from sql_instrumentation import SQLInstrumentationMiddleware
+from sharding import create_shard_schemas, shutdown_fan_out
+from session_index import rebuild as rebuild_session_index
+from mark_buffer import mark_buffer
+from attendance_cleanup import start_expiry_scheduler, stop_expiry_scheduler
 
 from auth import router as auth_router
 from admin_routes import router as admin_router
@@ -23,13 +32,14 @@ from routes.teacher_assignment import router as teacher_assignment_router
 from routes.teacher_dashboard import router as teacher_dashboard_router
 from teacher_attendance import router as teacher_attendance_router
 from routes import student
+from routes.admin_import import router as admin_import_router
+from qr_generator import router as qr_router
 
 # ------------------------
 # APP INIT
 # ------------------------
 app = FastAPI(title="NEXUS Backend")
 
-Base.metadata.create_all(bind=engine)
 # ------------------------
 # FOLDERS
 # ------------------------
@@ -52,6 +62,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ------------------------
+# SQL INSTRUMENTATION (per-request query count / time, slow + N+1 log)
+# ------------------------
+app.add_middleware(SQLInstrumentationMiddleware)
+
 @app.options("/{path:path}")
 def global_preflight(path: str):
     return Response(status_code=200)
@@ -69,6 +84,24 @@ def startup_event():
     # ✅ Create tables safely
     Base.metadata.create_all(bind=engine)
 
+    # ✅ Bring older databases up to the current schema (columns, indexes)
+    upgrade(engine)
+
+    # ✅ Per-branch shard files (DB_SHARDS), created from the current models
+    create_shard_schemas()
+
+    # ✅ Deactivate attendance sessions at their deadline (timer heap)
+    start_expiry_scheduler()
+
+    # ✅ Digit-code → active session index for attendance marking
+    rebuild_session_index()
+
+    # ✅ Expire OTPs / idle rate-limit buckets in the background
+    start_sweeper()
+
+    # ✅ Local SQLite read replica (REPLICA_SYNC=1)
+    start_replica_sync()
+
     # ✅ Ensure admin exists
     db: Session = SessionLocal()
     try:
@@ -92,11 +125,25 @@ def startup_event():
     finally:
         db.close()
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    # drain buffered attendance marks before the engines go away
+    await mark_buffer.close()
+    shutdown_executor()
+    stop_expiry_scheduler()
+    stop_sweeper()
+    stop_replica_sync()
+    shutdown_fan_out()
+    await async_engine.dispose()
+    for shard in async_shard_engines.values():
+        await shard.dispose()
+
 # ------------------------
 # ROUTERS
 # ------------------------
 app.include_router(auth_router)
 app.include_router(admin_router)
+app.include_router(admin_import_router)
 app.include_router(teacher_dashboard_router)
 app.include_router(chatbot_router)
 app.include_router(notes.router)
@@ -111,6 +158,7 @@ app.include_router(student_attendance_history_router)
 app.include_router(teacher_attendance_history_router)
 app.include_router(teacher_attendance_router)
 app.include_router(student.router)
+app.include_router(qr_router)
 
 # ------------------------
 # ROOT
@@ -127,11 +175,7 @@ def admin_dashboard(user=Depends(admin_only)):
     return {"message": f"Welcome Admin {user['username']}"}
 
 @app.get("/teacher/dashboard")
-def teacher_dashboard(
-    db: Session = Depends(get_db),
-    user=Depends(teacher_only)
-):
-    teacher = db.query(User).filter(User.id == user["user_id"]).first()
+def teacher_dashboard(teacher=Depends(teacher_only)):
     return {
         "message": f"Welcome Teacher {teacher.name}",
         "attendance": {},
@@ -5,8 +5,10 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from database import get_db
-from models import User, Attendance, TeacherSubject
+from models import User, TeacherSubject
 from check_user import teacher_only
+from attendance_writer import attendance_row, write_attendance
+from roster_cache import roster_cache
 
 router = APIRouter(
     prefix="/teacher/attendance",
@@ -29,6 +31,7 @@ class ManualAttendanceRequest(BaseModel):
     year: str
     attendance_date: date
     records: List[ManualAttendanceItem]
+    overwrite: bool = False   # True → apply status changes to an already-saved day
 
 
 # -----------------------------
@@ -61,23 +64,16 @@ def mark_manual_attendance(
         )
 
     # -----------------------------
-    # 2️⃣ Fetch valid students (same branch + year)
+    # 2️⃣ Roster ids (same branch + year), from the roster cache
     # -----------------------------
-    students = db.query(User).filter(
-        User.role == "student",
-        User.branch == teacher.branch,
-        User.year == data.year,
-        User.is_active == True
-    ).all()
-
-    if not students:
+    valid_student_ids = roster_cache.get(db, teacher.branch, data.year).active_ids()
+
+    if not valid_student_ids:
         raise HTTPException(
             status_code=404,
             detail="No students found for this class"
         )
 
-    valid_student_ids = {s.id for s in students}
-
     # -----------------------------
     # 3️⃣ Validate submitted records
     # -----------------------------
@@ -95,31 +91,25 @@ def mark_manual_attendance(
             )
 
     # -----------------------------
-    # 4️⃣ Prevent duplicate attendance for same date & subject
+    # 4️⃣ One bulk INSERT for new rows, one bulk UPDATE for changed statuses
     # -----------------------------
-    existing = db.query(Attendance).filter(
-        Attendance.subject == data.subject,
-        Attendance.date == data.attendance_date,
-        Attendance.student_id.in_(valid_student_ids)
-    ).first()
-
-    if existing:
+    result = write_attendance(
+        db,
+        [
+            attendance_row(r.student_id, assignment.subject_id, data.attendance_date, r.status)
+            for r in data.records
+        ],
+        overwrite=True
+    )
+
+    # re-submitting the same day is fine; changing it needs overwrite
+    if result.updated and not data.overwrite:
+        db.rollback()
         raise HTTPException(
             status_code=400,
-            detail="Attendance already exists for this subject and date"
-        )
-
-    # -----------------------------
-    # 5️⃣ Save attendance records
-    # -----------------------------
-    for record in data.records:
-        attendance = Attendance(
-            student_id=record.student_id,
-            subject=data.subject,
-            date=data.attendance_date,
-            status=record.status
+            detail="Attendance already exists for this subject and date "
+                   "(send overwrite=true to apply the changes)"
         )
-        db.add(attendance)
 
     db.commit()
 
@@ -127,7 +117,10 @@ def mark_manual_attendance(
         "message": "Manual attendance saved successfully",
         "subject": data.subject,
         "date": str(data.attendance_date),
-        "total_students": len(data.records)
+        "total_students": len(data.records),
+        "inserted": len(result.inserted),
+        "changed": len(result.updated),
+        "unchanged": len(result.skipped)
     }
 
 
@@ -138,17 +131,4 @@ def get_teacher_students(
     db: Session = Depends(get_db),
     teacher=Depends(teacher_only)
 ):
-    students = db.query(User).filter(
-        User.role == "student",
-        User.branch == teacher.branch,
-        User.year == year,
-        User.is_active == True
-    ).order_by(User.name).all()
-
-    return [
-        {
-            "id": s.id,
-            "name": s.name
-        }
-        for s in students
-    ]
+    return roster_cache.get(db, teacher.branch, year).as_list()
@@ -0,0 +1,163 @@
+"""
+Write-behind buffer for QR / digit-code attendance marks.
+
+    MARK_BUFFER=1                  → enable (default: off, one INSERT per mark)
+    MARK_BUFFER_FLUSH_MS=50        → flush at least this often
+    MARK_BUFFER_MAX_ROWS=200       → or as soon as this many marks are pending
+    MARK_BUFFER_DURABILITY=flush   → "flush":   respond after the batch commits
+                                     "enqueue": respond once queued (a crash
+                                                loses the pending batch)
+
+Marks are de-duplicated in memory by (student, subject, date) and written
+per branch shard through attendance_writer (multi-row INSERT ... ON
+CONFLICT DO NOTHING) in one transaction. The flusher task starts with the
+first mark and drains on shutdown.
+"""
+import asyncio
+import os
+from dataclasses import dataclass, field
+from datetime import date
+
+from attendance_writer import attendance_row, write_attendance_async
+from database import AsyncSessionLocal, route_to_branch
+
+MARK_BUFFER = os.getenv("MARK_BUFFER", "false").lower() in ("1", "true", "yes")
+MARK_BUFFER_FLUSH_MS = float(os.getenv("MARK_BUFFER_FLUSH_MS", "50"))
+MARK_BUFFER_MAX_ROWS = int(os.getenv("MARK_BUFFER_MAX_ROWS", "200"))
+MARK_BUFFER_DURABILITY = os.getenv("MARK_BUFFER_DURABILITY", "flush").lower()
+
+
+@dataclass
+class PendingMark:
+    student_id: int
+    subject_id: int
+    day: date
+    branch: str | None
+    done: asyncio.Future | None = field(default=None, compare=False)
+
+    @property
+    def key(self) -> tuple:
+        return (self.student_id, self.subject_id, self.day)
+
+
+class MarkBuffer:
+    def __init__(self, flush_ms: float, max_rows: int, durability: str):
+        self.flush_interval = flush_ms / 1000
+        self.max_rows = max_rows
+        self.ack_after_flush = durability != "enqueue"
+
+        self._pending: dict[tuple, PendingMark] = {}
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._closed = False
+
+        self._stats = {"batches": 0, "rows": 0, "duplicates": 0, "failed": 0}
+
+    # -------------------------
+    # PRODUCER
+    # -------------------------
+    async def submit(self, student_id: int, subject_id: int, day: date, branch: str | None) -> bool:
+        """
+        False → already marked (pending here or already in the table).
+        """
+        mark = PendingMark(student_id, subject_id, day, branch)
+
+        if mark.key in self._pending:
+            self._stats["duplicates"] += 1
+            return False
+
+        if self._closed:
+            # shutting down → write through
+            return mark.key in await self._write([mark])
+
+        self._ensure_flusher()
+        if self.ack_after_flush:
+            mark.done = asyncio.get_running_loop().create_future()
+
+        self._pending[mark.key] = mark
+        if len(self._pending) >= self.max_rows:
+            self._wake.set()
+
+        return await mark.done if mark.done else True
+
+    # -------------------------
+    # FLUSHER
+    # -------------------------
+    def _ensure_flusher(self):
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name="mark-buffer")
+
+    async def _run(self):
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+        await self.flush()
+
+    async def flush(self):
+        if not self._pending:
+            return
+
+        batch, self._pending = list(self._pending.values()), {}
+
+        by_branch: dict[str | None, list[PendingMark]] = {}
+        for mark in batch:
+            by_branch.setdefault(mark.branch, []).append(mark)
+
+        for marks in by_branch.values():
+            try:
+                inserted = await self._write(marks)
+            except Exception as e:
+                self._stats["failed"] += len(marks)
+                print(f"🚨 Mark buffer flush failed ({len(marks)} marks):", e)
+                for m in marks:
+                    if m.done and not m.done.done():
+                        m.done.set_exception(e)
+                continue
+
+            for m in marks:
+                if m.done and not m.done.done():
+                    m.done.set_result(m.key in inserted)
+
+    async def _write(self, marks: list[PendingMark]) -> set[tuple]:
+        async with AsyncSessionLocal() as db:
+            route_to_branch(db, marks[0].branch)
+            result = await write_attendance_async(
+                db, [attendance_row(m.student_id, m.subject_id, m.day) for m in marks]
+            )
+            await db.commit()
+
+        inserted = set(result.inserted)
+
+        self._stats["batches"] += 1
+        self._stats["rows"] += len(inserted)
+        self._stats["duplicates"] += len(marks) - len(inserted)
+        return inserted
+
+    async def close(self):
+        self._closed = True
+        if self._task is not None and not self._task.done():
+            self._wake.set()
+            await self._task
+        else:
+            await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": MARK_BUFFER,
+            "durability": "flush" if self.ack_after_flush else "enqueue",
+            "flush_ms": self.flush_interval * 1000,
+            "max_rows": self.max_rows,
+            "pending": len(self._pending),
+            **self._stats,
+            "avg_batch": round(self._stats["rows"] / self._stats["batches"], 1)
+            if self._stats["batches"] else 0.0,
+        }
+
+
+mark_buffer = MarkBuffer(MARK_BUFFER_FLUSH_MS, MARK_BUFFER_MAX_ROWS, MARK_BUFFER_DURABILITY)
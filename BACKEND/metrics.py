@@ -0,0 +1,53 @@
+import threading
+from collections import deque
+
+
+class LatencyStats:
+    """
+    Running latency counters plus a window of recent samples for percentiles.
+    """
+
+    def __init__(self, window: int = 1000):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def percentile(self, pct: float) -> float:
+        with self._lock:
+            samples = sorted(self._samples)
+
+        if not samples:
+            return 0.0
+
+        index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def stats(self) -> dict:
+        def ms(value):
+            return round(value * 1000, 2)
+
+        return {
+            "count": self.count,
+            "avg_ms": ms(self.total / self.count) if self.count else 0.0,
+            "p50_ms": ms(self.percentile(50)),
+            "p95_ms": ms(self.percentile(95)),
+            "p99_ms": ms(self.percentile(99)),
+            "max_ms": ms(self.max),
+        }
+
+
+# password hashing (utils + login pool); hash / verify time only the
+# bcrypt call itself, queue_wait is the wait for a login pool worker
+hash_latency = LatencyStats()
+verify_latency = LatencyStats()
+hash_queue_wait = LatencyStats()
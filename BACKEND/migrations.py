@@ -0,0 +1,354 @@
+"""
+Versioned, reversible schema migrations for existing databases.
+
+    python migrations.py status
+    python migrations.py upgrade [version]
+    python migrations.py downgrade <version>
+
+main.py runs `upgrade` on startup after create_all, so fresh databases
+are stamped at the latest version and older ones (e.g. app.db) get the
+missing columns and indexes in place without touching their data.
+"""
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import (
+    Boolean, Column, Date, DateTime, Enum, ForeignKey, Index, Integer, MetaData,
+    String, Table, UniqueConstraint, false, inspect, select, text,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateColumn
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    up: Callable[[Connection], None]
+    down: Callable[[Connection], None]
+
+
+# =========================
+# STEP BUILDERS
+# =========================
+def add_column(table: str, column: Column):
+    # type and default compiled for the connection's dialect
+    # (BOOLEAN DEFAULT 0 on SQLite, DEFAULT false on PostgreSQL)
+    def up(conn: Connection):
+        existing = {c["name"] for c in inspect(conn).get_columns(table)}
+        if column.name not in existing:
+            ddl = CreateColumn(column).compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {ddl}"))
+
+    def down(conn: Connection):
+        existing = {c["name"] for c in inspect(conn).get_columns(table)}
+        if column.name in existing:
+            conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column.name}"))
+
+    return up, down
+
+
+def create_indexes(indexes: list[tuple[str, str, tuple[str, ...]]]):
+    def up(conn: Connection):
+        for name, table, columns in indexes:
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+            ))
+
+    def down(conn: Connection):
+        for name, _, _ in indexes:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+    return up, down
+
+
+# name, table, columns — mirrored by Index(...) entries in models.py
+HOT_INDEXES = [
+    ("ix_attendance_subject_date", "attendance", ("subject", "date")),
+    ("ix_attendance_student_status", "attendance", ("student_id", "status")),
+    ("ix_assignments_branch_year_due", "assignments", ("branch", "year", "due_date")),
+    ("ix_submissions_assignment_student", "assignment_submissions", ("assignment_id", "student_id")),
+    ("ix_notes_branch_year_created", "notes", ("branch", "year", "created_at")),
+    ("ix_teacher_subjects_lookup", "teacher_subjects", ("teacher_id", "subject", "year", "branch")),
+    ("ix_users_role_branch_year", "users", ("role", "branch", "year")),
+    ("ix_sessions_teacher_active", "attendance_sessions", ("teacher_id", "is_active")),
+]
+
+
+# =========================
+# LOOKUP TABLES (SUBJECT / BRANCH / CLASS)
+# =========================
+# frozen copies of the schema at migration 4, independent of models.py
+_snapshot = MetaData()
+
+_branches = Table(
+    "branches", _snapshot,
+    Column("id", Integer, primary_key=True),
+    Column("name", String, unique=True, nullable=False),
+)
+_subjects = Table(
+    "subjects", _snapshot,
+    Column("id", Integer, primary_key=True),
+    Column("name", String, unique=True, nullable=False),
+)
+_classes = Table(
+    "classes", _snapshot,
+    Column("id", Integer, primary_key=True),
+    Column("branch_id", Integer, ForeignKey("branches.id"), nullable=False),
+    Column("year", Integer, nullable=False),
+    UniqueConstraint("branch_id", "year", name="uq_classes_branch_year"),
+)
+
+# referenced only, never created here
+_users = Table("users", _snapshot, Column("id", Integer, primary_key=True))
+
+_status = Enum("present", "absent", name="attendance_status")
+
+_attendance_legacy = Table(
+    "attendance", MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("student_id", Integer, ForeignKey(_users.c.id), nullable=False),
+    Column("subject", String, nullable=False),
+    Column("date", Date, nullable=False),
+    Column("status", _status, nullable=False),
+    UniqueConstraint("student_id", "subject", "date", name="unique_attendance_per_day"),
+    Index("ix_attendance_subject_date", "subject", "date"),
+    Index("ix_attendance_student_status", "student_id", "status"),
+)
+_attendance_encoded = Table(
+    "attendance", MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("student_id", Integer, ForeignKey(_users.c.id), nullable=False),
+    Column("subject_id", Integer, ForeignKey(_subjects.c.id), nullable=False),
+    Column("date", Date, nullable=False),
+    Column("status", _status, nullable=False),
+    UniqueConstraint("student_id", "subject_id", "date", name="uq_attendance_student_subject_date"),
+    Index("ix_attendance_subject_date", "subject_id", "date"),
+    Index("ix_attendance_student_status", "student_id", "status"),
+)
+
+# tables that keep their text columns and gain subject_id / class_id
+ENCODED_TABLES = ("attendance_sessions", "teacher_subjects", "notes", "assignments")
+
+
+def _columns(conn: Connection, table: str) -> set[str]:
+    return {c["name"] for c in inspect(conn).get_columns(table)}
+
+
+def _rebuild_attendance(conn: Connection, new: Table, copy_sql: str):
+    """
+    Swap attendance for `new`, copying rows with `copy_sql` (reads attendance_old).
+    """
+    conn.execute(text("ALTER TABLE attendance RENAME TO attendance_old"))
+    for index in new.indexes:
+        conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+    new.create(conn, checkfirst=True)
+    conn.execute(text(copy_sql))
+    conn.execute(text("DROP TABLE attendance_old"))
+
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(
+            "SELECT setval(pg_get_serial_sequence('attendance', 'id'), "
+            "COALESCE((SELECT MAX(id) FROM attendance), 1))"
+        ))
+
+
+def _year(value) -> int | None:
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def encode_lookups_up(conn: Connection):
+    for table in (_branches, _subjects, _classes):
+        table.create(conn, checkfirst=True)
+
+    legacy_attendance = "subject" in _columns(conn, "attendance")
+
+    # --- distinct names / (branch, year) pairs currently in use
+    subject_sources = list(ENCODED_TABLES) + (["attendance"] if legacy_attendance else [])
+    subjects = set()
+    for table in subject_sources:
+        subjects |= {n for (n,) in conn.execute(text(f"SELECT DISTINCT subject FROM {table}")) if n}
+
+    pairs = set()
+    for table in ("users",) + ENCODED_TABLES:
+        pairs |= {
+            (b, y) for b, y in conn.execute(text(f"SELECT DISTINCT branch, year FROM {table}"))
+            if b
+        }
+
+    existing = {n for (n,) in conn.execute(text("SELECT name FROM subjects"))}
+    if subjects - existing:
+        conn.execute(_subjects.insert(), [{"name": n} for n in sorted(subjects - existing)])
+
+    existing = {n for (n,) in conn.execute(text("SELECT name FROM branches"))}
+    branches = {b for b, _ in pairs}
+    if branches - existing:
+        conn.execute(_branches.insert(), [{"name": n} for n in sorted(branches - existing)])
+
+    branch_ids = dict(conn.execute(text("SELECT name, id FROM branches")).all())
+    existing = set(conn.execute(text("SELECT branch_id, year FROM classes")).all())
+    classes = {
+        (branch_ids[b], _year(y)) for b, y in pairs if _year(y) is not None
+    } - existing
+    if classes:
+        conn.execute(_classes.insert(), [{"branch_id": b, "year": y} for b, y in sorted(classes)])
+
+    class_ids = {
+        (b, y): i for i, b, y in conn.execute(text("SELECT id, branch_id, year FROM classes"))
+    }
+    subject_ids = dict(conn.execute(text("SELECT name, id FROM subjects")).all())
+
+    # --- back-fill the ids next to the text columns
+    for table in ENCODED_TABLES:
+        columns = _columns(conn, table)
+        for column in ("subject_id", "class_id"):
+            if column not in columns:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER"))
+
+        if subject_ids:
+            conn.execute(
+                text(f"UPDATE {table} SET subject_id = :id WHERE subject = :name"),
+                [{"id": i, "name": n} for n, i in subject_ids.items()]
+            )
+        raw_pairs = conn.execute(text(f"SELECT DISTINCT branch, year FROM {table}")).all()
+        updates = [
+            {"id": class_ids[(branch_ids[b], _year(y))], "b": b, "y": y}
+            for b, y in raw_pairs
+            if b in branch_ids and (branch_ids[b], _year(y)) in class_ids
+        ]
+        if updates:
+            conn.execute(
+                text(f"UPDATE {table} SET class_id = :id WHERE branch = :b AND year = :y"),
+                updates
+            )
+
+    # --- attendance: replace the subject text with its id
+    if legacy_attendance:
+        _rebuild_attendance(conn, _attendance_encoded, (
+            "INSERT INTO attendance (id, student_id, subject_id, date, status) "
+            "SELECT a.id, a.student_id, s.id, a.date, a.status "
+            "FROM attendance_old a JOIN subjects s ON s.name = a.subject"
+        ))
+
+
+def encode_lookups_down(conn: Connection):
+    if "subject_id" in _columns(conn, "attendance"):
+        _rebuild_attendance(conn, _attendance_legacy, (
+            "INSERT INTO attendance (id, student_id, subject, date, status) "
+            "SELECT a.id, a.student_id, s.name, a.date, a.status "
+            "FROM attendance_old a JOIN subjects s ON s.id = a.subject_id"
+        ))
+
+    for table in ENCODED_TABLES:
+        columns = _columns(conn, table)
+        for column in ("subject_id", "class_id"):
+            if column in columns:
+                conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+
+    for table in (_classes, _subjects, _branches):
+        table.drop(conn, checkfirst=True)
+
+
+MIGRATIONS = [
+    Migration(1, "users.token_version", *add_column(
+        "users", Column("token_version", Integer, nullable=False, server_default=text("0"))
+    )),
+    Migration(2, "otp_verifications.verified", *add_column(
+        "otp_verifications", Column("verified", Boolean, nullable=False, server_default=false())
+    )),
+    Migration(3, "hot query composite indexes", *create_indexes(HOT_INDEXES)),
+    Migration(4, "subject / branch / class lookup keys", encode_lookups_up, encode_lookups_down),
+]
+
+
+# =========================
+# RUNNER
+# =========================
+_schema_migrations = Table(
+    "schema_migrations", MetaData(),
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def _ensure_version_table(engine: Engine):
+    with engine.begin() as conn:
+        _schema_migrations.create(conn, checkfirst=True)
+
+
+def applied_versions(engine: Engine) -> set[int]:
+    _ensure_version_table(engine)
+    with engine.connect() as conn:
+        return set(conn.scalars(select(_schema_migrations.c.version)))
+
+
+def upgrade(engine: Engine, target: int | None = None) -> list[int]:
+    """
+    Apply pending steps up to `target` (latest by default), one transaction each.
+    """
+    applied = applied_versions(engine)
+    done = []
+
+    for m in MIGRATIONS:
+        if m.version in applied or (target is not None and m.version > target):
+            continue
+
+        with engine.begin() as conn:
+            m.up(conn)
+            conn.execute(_schema_migrations.insert().values(
+                version=m.version, name=m.name, applied_at=datetime.utcnow()
+            ))
+        done.append(m.version)
+
+    return done
+
+
+def downgrade(engine: Engine, target: int) -> list[int]:
+    """
+    Revert applied steps above `target`, newest first.
+    """
+    applied = applied_versions(engine)
+    done = []
+
+    for m in reversed(MIGRATIONS):
+        if m.version not in applied or m.version <= target:
+            continue
+
+        with engine.begin() as conn:
+            m.down(conn)
+            conn.execute(_schema_migrations.delete().where(
+                _schema_migrations.c.version == m.version
+            ))
+        done.append(m.version)
+
+    return done
+
+
+def main():
+    from database import engine
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    arg = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    if command == "upgrade":
+        print("✅ applied:", upgrade(engine, arg) or "nothing to do")
+    elif command == "downgrade" and arg is not None:
+        print("↩️ reverted:", downgrade(engine, arg) or "nothing to do")
+    elif command == "status":
+        applied = applied_versions(engine)
+        for m in MIGRATIONS:
+            print(f"{'✔' if m.version in applied else ' '} {m.version:>3}  {m.name}")
+    else:
+        print(__doc__)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from sqlalchemy.sql import func
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Date, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -12,6 +12,10 @@ from datetime import datetime
 class User(Base):
     __tablename__ = "users"
 
+    __table_args__ = (
+        Index("ix_users_role_branch_year", "role", "branch", "year"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     mobile = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
@@ -30,9 +34,44 @@ class User(Base):
     role = Column(String, default="student")  # student | teacher
     is_active = Column(Boolean, default=True)
 
+    # bumped on role / branch / status change → revokes issued tokens
+    token_version = Column(Integer, default=0, nullable=False, server_default="0")
+
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+# ------------------------
+# LOOKUPS (SUBJECT / BRANCH / CLASS)
+# ------------------------
+
+class Branch(Base):
+    __tablename__ = "branches"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+
+
+class Subject(Base):
+    __tablename__ = "subjects"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+
+
+class Class(Base):
+    __tablename__ = "classes"
+
+    __table_args__ = (
+        UniqueConstraint("branch_id", "year", name="uq_classes_branch_year"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    branch_id = Column(Integer, ForeignKey("branches.id"), nullable=False)
+    year = Column(Integer, nullable=False)     # 1,2,3,4
+
+    branch = relationship("Branch")
+
+
 # ------------------------
 # OTP VERIFICATION
 # ------------------------
@@ -43,6 +82,7 @@ class OTPVerification(Base):
     mobile = Column(String, primary_key=True, index=True)
     otp = Column(String, nullable=False)
     expires_at = Column(DateTime, nullable=False)
+    verified = Column(Boolean, default=False, nullable=False, server_default="0")
 
 
 # ------------------------
@@ -52,6 +92,10 @@ class OTPVerification(Base):
 class AttendanceSession(Base):
     __tablename__ = "attendance_sessions"
 
+    __table_args__ = (
+        Index("ix_sessions_teacher_active", "teacher_id", "is_active"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     teacher_id = Column(Integer, ForeignKey("users.id"))
 
@@ -59,6 +103,9 @@ class AttendanceSession(Base):
     branch = Column(String, nullable=False)
     year = Column(String, nullable=False)
     subject = Column(String, nullable=False)
+    # → subjects.id / classes.id (plain columns, as migration 4 adds them)
+    subject_id = Column(Integer, nullable=True)
+    class_id = Column(Integer, nullable=True)
 
     session_code = Column(String, unique=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -81,15 +128,17 @@ class Attendance(Base):
 
     __table_args__ = (
         UniqueConstraint(
-            "student_id", "subject", "date",
-            name="unique_attendance_per_day"
+            "student_id", "subject_id", "date",
+            name="uq_attendance_student_subject_date"
         ),
+        Index("ix_attendance_subject_date", "subject_id", "date"),
+        Index("ix_attendance_student_status", "student_id", "status"),
     )
 
     id = Column(Integer, primary_key=True)
     student_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
-    subject = Column(String, nullable=False)
+    subject_id = Column(Integer, ForeignKey("subjects.id"), nullable=False)
     date = Column(Date, nullable=False)
 
     status = Column(
@@ -97,6 +146,12 @@ class Attendance(Base):
         nullable=False
     )
 
+    subject_ref = relationship("Subject", lazy="joined")
+
+    @property
+    def subject(self) -> str:
+        return self.subject_ref.name
+
 
 
 # ------------------------
@@ -136,10 +191,17 @@ class ChatHistory(Base):
 class Notes(Base):
     __tablename__ = "notes"
 
+    __table_args__ = (
+        Index("ix_notes_branch_year_created", "branch", "year", "created_at"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     subject = Column(String, nullable=False)
     year = Column(String, nullable=False)
     branch = Column(String, nullable=False)
+    # → subjects.id / classes.id (plain columns, as migration 4 adds them)
+    subject_id = Column(Integer, nullable=True)
+    class_id = Column(Integer, nullable=True)
 
     filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
@@ -151,12 +213,19 @@ class Notes(Base):
 class TeacherSubject(Base):
     __tablename__ = "teacher_subjects"
 
+    __table_args__ = (
+        Index("ix_teacher_subjects_lookup", "teacher_id", "subject", "year", "branch"),
+    )
+
     id = Column(Integer, primary_key=True)
     teacher_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
     subject = Column(String, nullable=False)
     year = Column(String, nullable=False)     # 1,2,3,4
     branch = Column(String, nullable=False)
+    # → subjects.id / classes.id (plain columns, as migration 4 adds them)
+    subject_id = Column(Integer, nullable=True)
+    class_id = Column(Integer, nullable=True)
 
     teacher = relationship("User")
 
@@ -190,6 +259,10 @@ class ChatSession(Base):
 class Assignment(Base):
     __tablename__ = "assignments"
 
+    __table_args__ = (
+        Index("ix_assignments_branch_year_due", "branch", "year", "due_date"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
 
     teacher_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -197,6 +270,9 @@ class Assignment(Base):
     subject = Column(String, nullable=False)
     branch = Column(String, nullable=False)
     year = Column(String, nullable=False)
+    # → subjects.id / classes.id (plain columns, as migration 4 adds them)
+    subject_id = Column(Integer, nullable=True)
+    class_id = Column(Integer, nullable=True)
 
     title = Column(String, nullable=False)
     description = Column(String, nullable=True)
@@ -210,6 +286,10 @@ class Assignment(Base):
 class AssignmentSubmission(Base):
     __tablename__ = "assignment_submissions"
 
+    __table_args__ = (
+        Index("ix_submissions_assignment_student", "assignment_id", "student_id"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
 
     assignment_id = Column(Integer, ForeignKey("assignments.id"), nullable=False)
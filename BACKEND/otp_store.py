@@ -0,0 +1,165 @@
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from database import SessionLocal
+from models import OTPVerification
+from rate_limit import TokenBucketLimiter
+
+OTP_TTL_SECONDS = int(os.getenv("OTP_TTL_SECONDS", "300"))
+OTP_SWEEP_INTERVAL = float(os.getenv("OTP_SWEEP_INTERVAL", "60"))
+
+
+@dataclass
+class OTPEntry:
+    otp: str
+    expires_at: datetime
+    verified: bool = False
+
+    def expired(self, now: datetime | None = None) -> bool:
+        return self.expires_at < (now or datetime.utcnow())
+
+
+# =========================
+# BACKENDS
+# =========================
+class MemoryOTPStore:
+    """
+    Process-local store. OTPs are lost on restart, which only means the
+    user asks for a new one.
+    """
+
+    def __init__(self):
+        self._entries = {}   # mobile -> OTPEntry
+        self._lock = threading.Lock()
+
+    def put(self, mobile: str, otp: str, ttl: int = OTP_TTL_SECONDS):
+        with self._lock:
+            self._entries[mobile] = OTPEntry(
+                otp=otp,
+                expires_at=datetime.utcnow() + timedelta(seconds=ttl)
+            )
+
+    def get(self, mobile: str) -> OTPEntry | None:
+        with self._lock:
+            return self._entries.get(mobile)
+
+    def mark_verified(self, mobile: str):
+        with self._lock:
+            entry = self._entries.get(mobile)
+            if entry:
+                entry.verified = True
+
+    def delete(self, mobile: str):
+        with self._lock:
+            self._entries.pop(mobile, None)
+
+    def sweep(self) -> int:
+        now = datetime.utcnow()
+        with self._lock:
+            expired = [m for m, e in self._entries.items() if e.expired(now)]
+            for mobile in expired:
+                del self._entries[mobile]
+        return len(expired)
+
+
+class SQLOTPStore:
+    """
+    Store backed by the otp_verifications table (SQLite by default).
+    Survives restarts and is shared between worker processes.
+    """
+
+    def put(self, mobile: str, otp: str, ttl: int = OTP_TTL_SECONDS):
+        with SessionLocal() as db:
+            db.merge(
+                OTPVerification(
+                    mobile=mobile,
+                    otp=otp,
+                    expires_at=datetime.utcnow() + timedelta(seconds=ttl),
+                    verified=False
+                )
+            )
+            db.commit()
+
+    def get(self, mobile: str) -> OTPEntry | None:
+        with SessionLocal() as db:
+            record = db.get(OTPVerification, mobile)
+            if not record:
+                return None
+            return OTPEntry(record.otp, record.expires_at, bool(record.verified))
+
+    def mark_verified(self, mobile: str):
+        with SessionLocal() as db:
+            db.query(OTPVerification).filter_by(mobile=mobile).update(
+                {OTPVerification.verified: True}
+            )
+            db.commit()
+
+    def delete(self, mobile: str):
+        with SessionLocal() as db:
+            db.query(OTPVerification).filter_by(mobile=mobile).delete()
+            db.commit()
+
+    def sweep(self) -> int:
+        with SessionLocal() as db:
+            removed = db.query(OTPVerification).filter(
+                OTPVerification.expires_at < datetime.utcnow()
+            ).delete(synchronize_session=False)
+            db.commit()
+        return removed
+
+
+def create_otp_store():
+    backend = os.getenv("OTP_STORE", "memory").lower()
+    if backend == "memory":
+        return MemoryOTPStore()
+    if backend in ("sql", "sqlite", "db"):
+        return SQLOTPStore()
+    raise ValueError(f"Unknown OTP_STORE backend: {backend}")
+
+
+otp_store = create_otp_store()
+
+# per-mobile limits: sending costs an SMS, verifying guards against guessing
+send_limiter = TokenBucketLimiter(
+    burst=int(os.getenv("OTP_SEND_BURST", "3")),
+    rate=float(os.getenv("OTP_SEND_PER_MINUTE", "1")) / 60
+)
+verify_limiter = TokenBucketLimiter(
+    burst=int(os.getenv("OTP_VERIFY_BURST", "5")),
+    rate=float(os.getenv("OTP_VERIFY_PER_MINUTE", "5")) / 60
+)
+
+
+# =========================
+# BACKGROUND SWEEPER
+# =========================
+_sweeper: threading.Thread | None = None
+_stop = threading.Event()
+
+
+def _sweep_loop():
+    while not _stop.wait(OTP_SWEEP_INTERVAL):
+        try:
+            otp_store.sweep()
+            send_limiter.sweep()
+            verify_limiter.sweep()
+        except Exception as e:
+            print("⚠️ OTP sweep failed:", e)
+
+
+def start_sweeper():
+    global _sweeper
+    if _sweeper is None:
+        _stop.clear()
+        _sweeper = threading.Thread(target=_sweep_loop, name="otp-sweeper", daemon=True)
+        _sweeper.start()
+
+
+def stop_sweeper():
+    global _sweeper
+    _stop.set()
+    if _sweeper is not None:
+        _sweeper.join(timeout=5)
+        _sweeper = None
@@ -1,11 +1,190 @@
+"""
+QR codes rendered in memory (no files written).
+
+    GET /attendance/qr/{session_code}?format=svg|png&size=10
+    GET /qr?text=...
+
+The attendance QR carries what the teacher screen shows: the 6-digit
+code, or {"session_id", "digit_code"} for rotating codes. Rendered bytes
+are kept in a bounded LRU keyed by (session code, payload, format, size)
+whose entries expire with the session (or at the next code rotation).
+Responses carry a strong ETag derived from the payload, so a projector
+re-fetching an unchanged code gets a 304 without a render or a query.
+
+The session code in the URL is the capability: it is only handed to the
+teacher who started the session, so the route takes no bearer token and
+works from a plain <img src>.
+
+SVG is the default: it needs nothing beyond qrcode. PNG needs Pillow or
+pypng, which requirements.txt does not pin.
+"""
+import hashlib
+import io
+import json
+import os
+from datetime import datetime
+
 import qrcode
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+from qrcode.image.svg import SvgPathImage
+from sqlalchemy.orm import Session
+
+from models import AttendanceSession
+from rotating_codes import current_code
+from session_index import ActiveSession, active_sessions
+from sharding import for_each_shard
+from ttl_cache import TTLCache
+
+QR_BORDER = 2
+QR_MAX_TEXT = 512
+
+MEDIA_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+qr_cache = TTLCache(
+    maxsize=int(os.getenv("QR_CACHE_SIZE", "256")),
+    ttl=180
+)
+
+router = APIRouter(tags=["QR"])
+
+
+# =========================
+# RENDER
+# =========================
+def render_qr(text: str, fmt: str, size: int) -> bytes:
+    # png: qrcode's default factory (Pillow, else pypng); svg needs neither
+    factory = SvgPathImage if fmt == "svg" else None
+
+    qr = qrcode.QRCode(box_size=size, border=QR_BORDER, image_factory=factory)
+    qr.add_data(text)
+    qr.make(fit=True)
+
+    buffer = io.BytesIO()
+    try:
+        qr.make_image().save(buffer)
+    except ImportError:
+        raise HTTPException(
+            status_code=501,
+            detail="PNG rendering needs Pillow or pypng installed, use format=svg"
+        )
+    return buffer.getvalue()
+
+
+def _etag(*parts) -> str:
+    digest = hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _qr_response(request: Request, body: bytes | None, etag: str, fmt: str, max_age: int) -> Response:
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={max_age}"}
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=body, media_type=MEDIA_TYPES[fmt], headers=headers)
+
 
-router = APIRouter()
+def _check_format(fmt: str, size: int):
+    if fmt not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be png or svg")
+    if not 1 <= size <= 40:
+        raise HTTPException(status_code=400, detail="size must be between 1 and 40")
 
+
+# =========================
+# ATTENDANCE SESSION QR
+# =========================
+def _find_session(session_code: str) -> ActiveSession | None:
+    session = active_sessions.get_by_session_code(session_code)
+    if session is not None:
+        return session
+
+    # started by another worker → look in every shard (no identity here)
+    def load(db: Session):
+        return db.query(AttendanceSession).filter(
+            AttendanceSession.session_code == session_code,
+            AttendanceSession.is_active == True
+        ).first()
+
+    for row in for_each_shard(load):
+        if row is not None:
+            session = ActiveSession.from_row(row)
+            if not session.expired():
+                active_sessions.add(session)
+            return session
+    return None
+
+
+def _payload(session: ActiveSession) -> tuple[str, float]:
+    """
+    QR text and how long it stays valid (seconds).
+    """
+    remaining = (session.expires_at - datetime.utcnow()).total_seconds()
+
+    if session.digit_code is not None:
+        return session.digit_code, remaining
+
+    rotating = current_code(session.branch, session.session_id)
+    text = json.dumps(
+        {"session_id": session.session_id, "digit_code": rotating["code"]},
+        separators=(",", ":")
+    )
+    return text, min(remaining, rotating["rotates_in"])
+
+
+@router.get("/attendance/qr/{session_code}")
+def attendance_qr(
+    session_code: str,
+    request: Request,
+    format: str = "svg",
+    size: int = 10
+):
+    _check_format(format, size)
+
+    session = _find_session(session_code)
+    if session is None or session.expired():
+        raise HTTPException(status_code=404, detail="Attendance session not active")
+
+    text, ttl = _payload(session)
+    etag = _etag(session_code, text, format, size)
+    max_age = max(int(ttl), 0)
+
+    # unchanged code → 304 before touching the cache or the renderer
+    if request.headers.get("if-none-match") == etag:
+        return _qr_response(request, None, etag, format, max_age)
+
+    key = (session_code, text, format, size)
+    body = qr_cache.get(key)
+    if body is None:
+        body = render_qr(text, format, size)
+        qr_cache.set(key, body, ttl=ttl)
+
+    return _qr_response(request, body, etag, format, max_age)
+
+
+# =========================
+# GENERIC TEXT QR
+# =========================
 @router.get("/qr")
-def generate_qr(text: str):
-    img = qrcode.make(text)
-    path = "qr.png"
-    img.save(path)
-    return {"message": "QR generated", "file": path}
+def generate_qr(
+    text: str,
+    request: Request,
+    format: str = "svg",
+    size: int = 10
+):
+    _check_format(format, size)
+
+    if len(text) > QR_MAX_TEXT:
+        raise HTTPException(status_code=400, detail=f"text longer than {QR_MAX_TEXT} characters")
+
+    etag = _etag(text, format, size)
+    body = None
+    if request.headers.get("if-none-match") != etag:
+        body = render_qr(text, format, size)
+
+    return _qr_response(request, body, etag, format, max_age=3600)
+
@@ -0,0 +1,48 @@
+import threading
+import time
+
+
+class TokenBucketLimiter:
+    """
+    Per-key token buckets: `burst` requests at once, then `rate` per second.
+    """
+
+    def __init__(self, burst: int, rate: float):
+        self.burst = burst
+        self.rate = rate
+
+        self._buckets = {}   # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def allow(self, key) -> bool:
+        now = time.monotonic()
+
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return False
+
+            self._buckets[key] = (tokens - 1, now)
+            return True
+
+    def retry_after(self, key) -> int:
+        with self._lock:
+            tokens, _ = self._buckets.get(key, (self.burst, 0))
+        return max(1, int((1 - tokens) / self.rate) + 1) if self.rate else 60
+
+    def sweep(self) -> int:
+        """
+        Forget buckets that have refilled completely.
+        """
+        now = time.monotonic()
+        with self._lock:
+            full = [
+                key for key, (tokens, updated_at) in self._buckets.items()
+                if tokens + (now - updated_at) * self.rate >= self.burst
+            ]
+            for key in full:
+                del self._buckets[key]
+        return len(full)
@@ -0,0 +1,70 @@
+"""
+Local stand-in for a read replica: copies the primary SQLite file into
+READ_DATABASE_URL with the sqlite3 backup API every few seconds.
+
+Started from main.py when REPLICA_SYNC=1 and both URLs are SQLite files.
+"""
+import os
+import sqlite3
+import threading
+
+from sqlalchemy.engine import make_url
+
+from database import DATABASE_URL, READ_DATABASE_URL, SQLITE_PRAGMAS, mark_replica_synced
+
+REPLICA_SYNC_INTERVAL = float(os.getenv("REPLICA_SYNC_INTERVAL", "5"))
+
+_thread: threading.Thread | None = None
+_stop = threading.Event()
+
+
+def sync_enabled() -> bool:
+    return (
+        os.getenv("REPLICA_SYNC", "false").lower() in ("1", "true", "yes")
+        and bool(READ_DATABASE_URL)
+        and DATABASE_URL.startswith("sqlite")
+        and READ_DATABASE_URL.startswith("sqlite")
+    )
+
+
+def sync_once():
+    primary = sqlite3.connect(make_url(DATABASE_URL).database)
+    replica = sqlite3.connect(
+        make_url(READ_DATABASE_URL).database,
+        timeout=SQLITE_PRAGMAS["busy_timeout"] / 1000
+    )
+    try:
+        primary.backup(replica)
+    finally:
+        replica.close()
+        primary.close()
+
+    mark_replica_synced()
+
+
+def _loop():
+    while True:
+        try:
+            sync_once()
+        except sqlite3.Error as e:
+            # replica keeps its last copy; lag grows until get_read_db falls back
+            print("⚠️ Replica sync failed:", e)
+
+        if _stop.wait(REPLICA_SYNC_INTERVAL):
+            return
+
+
+def start_replica_sync():
+    global _thread
+    if _thread is None and sync_enabled():
+        _stop.clear()
+        _thread = threading.Thread(target=_loop, name="replica-sync", daemon=True)
+        _thread.start()
+
+
+def stop_replica_sync():
+    global _thread
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout=10)
+        _thread = None
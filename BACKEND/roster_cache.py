@@ -0,0 +1,112 @@
+"""
+Class rosters per (branch, year), shared by the teacher student lists,
+manual attendance, the teacher dashboard and the admin branch view.
+
+A roster is loaded with one column-only query and kept compact: ids in
+an int64 array, names/mobiles as tuples, active flags as bytes, ordered
+by name. `year=None` is the whole branch. Routes that change who is in a
+class (registration, import, promotion, demotion, (de)activation,
+deletion) call `invalidate` after their commit; the TTL bounds how long
+another worker can serve a roster it was not told about.
+"""
+import os
+import sys
+import threading
+from array import array
+
+from sqlalchemy.orm import Session
+
+from models import User
+from ttl_cache import TTLCache
+
+
+def _year_key(year) -> str | None:
+    # User.year is "1", query params / assignments may hand us 1
+    return None if year is None else str(year).strip()
+
+
+class Roster:
+    __slots__ = ("ids", "names", "mobiles", "active", "nbytes")
+
+    def __init__(self, rows):
+        self.ids = array("q", (r[0] for r in rows))
+        self.names = tuple(r[1] for r in rows)
+        self.mobiles = tuple(r[2] for r in rows)
+        self.active = bytes(bool(r[3]) for r in rows)
+        self.nbytes = (
+            sys.getsizeof(self.ids) + sys.getsizeof(self.active)
+            + sys.getsizeof(self.names) + sum(map(sys.getsizeof, self.names))
+            + sys.getsizeof(self.mobiles) + sum(map(sys.getsizeof, self.mobiles))
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def active_ids(self) -> set[int]:
+        return {i for i, on in zip(self.ids, self.active) if on}
+
+    def as_list(self, active_only: bool = True, mobile: bool = False) -> list[dict]:
+        students = []
+        for i, student_id in enumerate(self.ids):
+            if active_only and not self.active[i]:
+                continue
+            entry = {"id": student_id, "name": self.names[i]}
+            if mobile:
+                entry["mobile"] = self.mobiles[i]
+            students.append(entry)
+        return students
+
+
+class RosterCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def get(self, db: Session, branch: str, year=None) -> Roster:
+        key = (branch, _year_key(year))
+        roster = self._cache.get(key)
+        if roster is not None:
+            return roster
+
+        with self._lock:
+            generation = self._generation
+
+        query = db.query(User.id, User.name, User.mobile, User.is_active).filter(
+            User.role == "student",
+            User.branch == branch
+        )
+        if key[1] is not None:
+            query = query.filter(User.year == key[1])
+        roster = Roster(query.order_by(User.name, User.id).all())
+
+        # an invalidate() while we were reading → the rows may predate it
+        with self._lock:
+            if generation == self._generation:
+                self._cache.set(key, roster)
+        return roster
+
+    def invalidate(self, branch: str | None, year=None):
+        with self._lock:
+            self._generation += 1
+            self._cache.pop((branch, _year_key(year)))
+            self._cache.pop((branch, None))
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        rosters = self._cache.values()
+        return {
+            **self._cache.stats(),
+            "students": sum(map(len, rosters)),
+            "bytes": sum(r.nbytes for r in rosters),
+        }
+
+
+roster_cache = RosterCache(
+    maxsize=int(os.getenv("ROSTER_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("ROSTER_CACHE_TTL", "600"))
+)
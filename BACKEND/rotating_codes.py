@@ -0,0 +1,63 @@
+"""
+Stateless rotating attendance codes (ATTENDANCE_CODE_MODE=rotating).
+
+    step = unix_time // ATTENDANCE_CODE_STEP
+    code = 6 digits truncated from HMAC-SHA256(key, session_id || step || branch)   (HOTP style)
+
+Nothing is stored per code: the teacher's screen fetches the current code,
+students send it with the session id, and the server recomputes the
+HMAC for the current step and the ATTENDANCE_CODE_SKEW steps before it
+(a code read just before it rotated). Codes older than that are rejected,
+so a code passed around after the fact stops working within seconds.
+The branch is part of the message because session ids repeat across
+DB_SHARDS shards: BCA session 7 and BBA session 7 show different codes.
+"""
+import hashlib
+import hmac
+import os
+import struct
+import time
+
+from utils import SECRET_KEY
+
+ATTENDANCE_CODE_MODE = os.getenv("ATTENDANCE_CODE_MODE", "static").lower()
+ROTATING_CODES = ATTENDANCE_CODE_MODE == "rotating"
+ATTENDANCE_CODE_STEP = int(os.getenv("ATTENDANCE_CODE_STEP", "15"))
+ATTENDANCE_CODE_SKEW = int(os.getenv("ATTENDANCE_CODE_SKEW", "1"))
+
+# derived key → the JWT secret itself never signs attendance codes
+_KEY = hmac.new(SECRET_KEY.encode(), b"nexus-attendance-codes", hashlib.sha256).digest()
+
+
+def _step(now: float | None = None) -> int:
+    return int((time.time() if now is None else now) // ATTENDANCE_CODE_STEP)
+
+
+def code_at(branch: str | None, session_id: int, step: int) -> str:
+    message = struct.pack(">QQ", session_id, step) + (branch or "").encode()
+    digest = hmac.new(_KEY, message, hashlib.sha256).digest()
+    offset = digest[-1] & 0x0F
+    value = int.from_bytes(digest[offset:offset + 4], "big") & 0x7FFFFFFF
+    return f"{value % 1_000_000:06d}"
+
+
+def current_code(branch: str | None, session_id: int, now: float | None = None) -> dict:
+    now = time.time() if now is None else now
+    step = _step(now)
+    return {
+        "code": code_at(branch, session_id, step),
+        "step_seconds": ATTENDANCE_CODE_STEP,
+        "rotates_in": round((step + 1) * ATTENDANCE_CODE_STEP - now, 3),
+    }
+
+
+def verify_code(branch: str | None, session_id: int, code: str, now: float | None = None) -> bool:
+    if not (len(code) == 6 and code.isascii() and code.isdigit()):
+        return False
+
+    step = _step(now)
+    matched = False
+    # compare against every window (no early exit) → constant work per call
+    for s in range(step - ATTENDANCE_CODE_SKEW, step + 1):
+        matched |= hmac.compare_digest(code_at(branch, session_id, s), code)
+    return matched
@@ -0,0 +1,220 @@
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
+from openpyxl import load_workbook
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal
+from models import User
+from check_user import admin_only
+from roster_cache import roster_cache
+from metrics import hash_latency
+from utils import hash_password_timed
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+IMPORT_HASH_WORKERS = int(os.getenv("IMPORT_HASH_WORKERS", str(os.cpu_count() or 2)))
+
+REQUIRED_COLUMNS = {
+    "student": ["mobile", "password", "name", "dob", "gender", "branch", "year"],
+    "teacher": ["mobile", "password", "name", "dob", "gender", "branch"],
+}
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin / Import"]
+)
+
+
+# =========================
+# READ SHEET IN CHUNKS
+# =========================
+def _csv_chunks(path: str):
+    for df in pd.read_csv(
+        path,
+        dtype=str,
+        keep_default_na=False,
+        chunksize=IMPORT_CHUNK_SIZE
+    ):
+        df.columns = [str(c).strip().lower() for c in df.columns]
+        yield df.to_dict("records")
+
+
+def _excel_chunks(path: str):
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [str(c or "").strip().lower() for c in next(rows, [])]
+
+        chunk = []
+        for values in rows:
+            chunk.append({
+                col: "" if value is None else str(value).strip()
+                for col, value in zip(header, values)
+            })
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                yield chunk
+                chunk = []
+
+        if chunk:
+            yield chunk
+    finally:
+        wb.close()
+
+
+# =========================
+# VALIDATION
+# =========================
+def _validate_row(row: dict, role: str) -> str | None:
+    for col in REQUIRED_COLUMNS[role]:
+        if not str(row.get(col, "")).strip():
+            return f"Missing {col}"
+
+    if not row["mobile"].strip().isdigit():
+        return "Mobile must be digits only"
+
+    if role == "student" and not row["year"].strip().isdigit():
+        return "Year must be a number"
+
+    return None
+
+
+def _user_values(row: dict, role: str, hashed_password: str) -> dict:
+    return {
+        "mobile": row["mobile"].strip(),
+        "hashed_password": hashed_password,
+        "name": row["name"].strip(),
+        "dob": row["dob"].strip(),
+        "gender": row["gender"].strip(),
+        "branch": row["branch"].strip(),
+        "year": row["year"].strip() if role == "student" else None,  # 🔑 teacher → NULL
+        "role": role,
+        "is_active": True,
+        "token_version": 0,
+        "created_at": datetime.utcnow(),
+    }
+
+
+# =========================
+# BULK IMPORT (CSV / EXCEL)
+# =========================
+@router.post("/users/import")
+def import_users(
+    file: UploadFile = File(...),
+    role: str = Form("student"),
+    dry_run: bool = Form(False),
+    admin=Depends(admin_only)
+):
+    """
+    Streams NDJSON: one "progress" line per chunk (with that chunk's row
+    errors), then a "done" line with totals.
+    """
+    if role not in REQUIRED_COLUMNS:
+        raise HTTPException(status_code=400, detail="Role must be student or teacher")
+
+    ext = os.path.splitext(file.filename or "")[1].lower()
+    if ext == ".csv":
+        read_chunks = _csv_chunks
+    elif ext in (".xlsx", ".xlsm"):
+        read_chunks = _excel_chunks
+    else:
+        raise HTTPException(status_code=400, detail="Upload a .csv or .xlsx file")
+
+    # keep our own copy: the upload is closed once this handler returns
+    tmp = tempfile.NamedTemporaryFile(suffix=ext, delete=False)
+    with tmp:
+        shutil.copyfileobj(file.file, tmp)
+
+    def run():
+        db = SessionLocal()
+        pool = None if dry_run else ProcessPoolExecutor(max_workers=IMPORT_HASH_WORKERS)
+
+        totals = {"processed": 0, "created": 0, "failed": 0}
+        seen = set()
+        row_number = 1   # header
+
+        try:
+            for chunk in read_chunks(tmp.name):
+                errors = []
+                valid = []
+
+                for row in chunk:
+                    row_number += 1
+                    error = _validate_row(row, role)
+                    mobile = str(row.get("mobile", "")).strip()
+
+                    if not error and mobile in seen:
+                        error = "Duplicate mobile in file"
+
+                    if error:
+                        errors.append({"row": row_number, "mobile": mobile, "error": error})
+                    else:
+                        seen.add(mobile)
+                        valid.append((row_number, row))
+
+                # one query per chunk for accounts that already exist
+                existing = {
+                    m for (m,) in db.query(User.mobile).filter(
+                        User.mobile.in_([r["mobile"].strip() for _, r in valid])
+                    )
+                } if valid else set()
+                for n, r in valid:
+                    if r["mobile"].strip() in existing:
+                        errors.append({"row": n, "mobile": r["mobile"].strip(), "error": "Mobile already exists"})
+                valid = [(n, r) for n, r in valid if r["mobile"].strip() not in existing]
+
+                created = 0
+                if valid and not dry_run:
+                    hashed = pool.map(
+                        hash_password_timed,
+                        [r["password"] for _, r in valid],
+                        chunksize=max(1, len(valid) // (IMPORT_HASH_WORKERS * 4))
+                    )
+                    values = []
+                    for (_, r), (h, seconds) in zip(valid, hashed):
+                        # timed in the worker, recorded here (workers have their own metrics)
+                        hash_latency.record(seconds)
+                        values.append(_user_values(r, role, h))
+
+                    try:
+                        db.execute(insert(User), values)
+                        db.commit()
+                        created = len(values)
+                        if role == "student":
+                            for branch, year in {(v["branch"], v["year"]) for v in values}:
+                                roster_cache.invalidate(branch, year)
+                    except IntegrityError:
+                        db.rollback()
+                        errors.extend(
+                            {"row": n, "mobile": r["mobile"].strip(), "error": "Insert failed (duplicate)"}
+                            for n, r in valid
+                        )
+                elif dry_run:
+                    created = len(valid)
+
+                totals["processed"] += len(chunk)
+                totals["created"] += created
+                totals["failed"] += len(errors)
+
+                yield json.dumps({"event": "progress", **totals, "errors": errors}) + "\n"
+
+            yield json.dumps({"event": "done", "dry_run": dry_run, **totals}) + "\n"
+
+        except Exception as e:
+            db.rollback()
+            yield json.dumps({"event": "error", "detail": str(e), **totals}) + "\n"
+
+        finally:
+            db.close()
+            if pool:
+                pool.shutdown()
+            os.unlink(tmp.name)
+
+    return StreamingResponse(run(), media_type="application/x-ndjson")
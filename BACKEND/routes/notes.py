@@ -1,12 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 import os, uuid
 from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi.responses import FileResponse
 
-from database import get_db
+from database import get_db, get_async_db
 from models import Notes, TeacherSubject
-from check_user import teacher_only, student_only
+from check_user import teacher_only, student_only, teacher_only_async, student_only_async
 
 UPLOAD_DIR = "uploads/notes"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -50,6 +52,8 @@ def upload_notes(
         subject=subject,
         year=year,
         branch=teacher.branch,
+        subject_id=assignment.subject_id,
+        class_id=assignment.class_id,
         filename=file.filename,
         file_path=file_path,
         uploaded_by=teacher.id,
@@ -64,18 +68,24 @@ def upload_notes(
 
 
 @router.get("/student")
-def get_student_notes(
-    db: Session = Depends(get_db),
-    student=Depends(student_only)
+async def get_student_notes(
+    db: AsyncSession = Depends(get_async_db),
+    student=Depends(student_only_async)
 ):
     """
     Students fetch notes for their branch & year ONLY
     """
 
-    notes = db.query(Notes).filter(
-        Notes.branch == student.branch,
-        Notes.year == student.year
-    ).order_by(Notes.created_at.desc()).all()
+    notes = (
+        await db.execute(
+            select(Notes.id, Notes.subject, Notes.filename, Notes.created_at)
+            .where(
+                Notes.branch == student.branch,
+                Notes.year == student.year
+            )
+            .order_by(Notes.created_at.desc())
+        )
+    ).all()
 
     return [
         {
@@ -197,17 +207,21 @@ def get_teacher_subjects(
         for a in assignments
     ]
 @router.get("/teacher")
-def get_teacher_notes(
-    db: Session = Depends(get_db),
-    teacher=Depends(teacher_only)
+async def get_teacher_notes(
+    db: AsyncSession = Depends(get_async_db),
+    teacher=Depends(teacher_only_async)
 ):
     """
     Teacher fetches their uploaded notes
     """
 
-    notes = db.query(Notes).filter(
-        Notes.uploaded_by == teacher.id
-    ).order_by(Notes.created_at.desc()).all()
+    notes = (
+        await db.execute(
+            select(Notes.id, Notes.subject, Notes.filename, Notes.created_at)
+            .where(Notes.uploaded_by == teacher.id)
+            .order_by(Notes.created_at.desc())
+        )
+    ).all()
 
     return [
         {
@@ -2,8 +2,8 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
 from database import get_db
-from models import User
 from check_user import teacher_only
+from roster_cache import roster_cache
 
 router = APIRouter(
     prefix="/teacher",
@@ -16,14 +16,4 @@ def get_teacher_students(
     db: Session = Depends(get_db),
     teacher=Depends(teacher_only)
 ):
-    students = db.query(User).filter(
-        User.role == "student",
-        User.branch == teacher.branch,
-        User.year == year,
-        User.is_active == True
-    ).order_by(User.name).all()
-
-    return [
-        { "id": s.id, "name": s.name }
-        for s in students
-    ]
+    return roster_cache.get(db, teacher.branch, year).as_list()
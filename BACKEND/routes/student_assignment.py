@@ -4,12 +4,15 @@ from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
 from fastapi.responses import FileResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from jose import jwt, JWTError
+from jose import JWTError
 
-from database import get_db
-from models import Assignment, AssignmentSubmission, User
-from utils import SECRET_KEY, ALGORITHM
+from database import get_db, get_async_db, route_to_branch
+from models import Assignment, AssignmentSubmission
+from check_user import load_user, load_user_async
+from utils import decode_access_token
 
 UPLOAD_DIR = "uploads/assignments/submissions"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -23,32 +26,43 @@ router = APIRouter(
 # =========================
 # INTERNAL AUTH (HEADER OR QUERY)
 # =========================
-def get_student_from_token(
-    db: Session,
-    token: str | None
-):
+def _token_user_id(token: str | None) -> int:
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         user_id = payload.get("user_id")
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid token")
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    student = (
-        db.query(User)
-        .filter(
-            User.id == user_id,
-            User.role == "student",
-            User.is_active == True
-        )
-        .first()
-    )
+    return user_id
+
+
+def get_student_from_token(
+    db: Session,
+    token: str | None
+):
+    user_id = _token_user_id(token)
+    student = _require_student(load_user(db, user_id))
+    route_to_branch(db, student.branch)
+    return student
 
-    if not student:
+
+async def get_student_from_token_async(
+    db: AsyncSession,
+    token: str | None
+):
+    user_id = _token_user_id(token)
+    student = _require_student(await load_user_async(db, user_id))
+    route_to_branch(db, student.branch)
+    return student
+
+
+def _require_student(student):
+    if not student or student.role != "student" or not student.is_active:
         raise HTTPException(status_code=403, detail="Student only")
 
     return student
@@ -58,33 +72,36 @@ def get_student_from_token(
 # LIST ASSIGNMENTS
 # =========================
 @router.get("/")
-def list_student_assignments(
-    db: Session = Depends(get_db),
+async def list_student_assignments(
+    db: AsyncSession = Depends(get_async_db),
     token: str | None = Query(default=None)
 ):
-    student = get_student_from_token(db, token)
+    student = await get_student_from_token_async(db, token)
 
     assignments = (
-        db.query(Assignment)
-        .filter(
-            Assignment.branch == student.branch,
-            Assignment.year == student.year
+        await db.execute(
+            select(Assignment)
+            .where(
+                Assignment.branch == student.branch,
+                Assignment.year == student.year
+            )
+            .order_by(Assignment.due_date)
         )
-        .order_by(Assignment.due_date)
-        .all()
-    )
+    ).scalars().all()
 
     result = []
 
     for a in assignments:
         submission = (
-            db.query(AssignmentSubmission)
-            .filter(
-                AssignmentSubmission.assignment_id == a.id,
-                AssignmentSubmission.student_id == student.id
+            await db.execute(
+                select(AssignmentSubmission)
+                .where(
+                    AssignmentSubmission.assignment_id == a.id,
+                    AssignmentSubmission.student_id == student.id
+                )
+                .limit(1)
             )
-            .first()
-        )
+        ).scalar()
 
         result.append({
             "assignment_id": a.id,
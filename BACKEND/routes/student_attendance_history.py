@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func
 
 from database import get_db
-from models import Attendance
+from models import Attendance, Subject
 from check_user import student_only
 
 router = APIRouter(
@@ -22,14 +22,15 @@ def student_attendance_summary(
 
     records = (
         db.query(
-            Attendance.subject,
+            Subject.name.label("subject"),
             func.count(Attendance.id).label("present_days")
         )
+        .join(Subject, Subject.id == Attendance.subject_id)
         .filter(
             Attendance.student_id == student.id,
             Attendance.status == "present"
         )
-        .group_by(Attendance.subject)
+        .group_by(Attendance.subject_id, Subject.name)
         .all()
     )
 
@@ -4,11 +4,13 @@ import csv
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import timezone, timedelta
-from database import get_db
+from database import get_db, get_async_db
 from models import Assignment, AssignmentSubmission, User, TeacherSubject
-from check_user import teacher_only
+from check_user import teacher_only, teacher_only_async
 
 UPLOAD_DIR = "uploads/assignments"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -55,6 +57,8 @@ def create_assignment(
         subject=subject,
         branch=teacher.branch,
         year=year,
+        subject_id=assignment_check.subject_id,
+        class_id=assignment_check.class_id,
         title=title,
         description=description,
         file_path=file_path,
@@ -72,13 +76,24 @@ def create_assignment(
 # LIST ASSIGNMENTS
 # ======================================================
 @router.get("/")
-def list_teacher_assignments(
-    db: Session = Depends(get_db),
-    teacher=Depends(teacher_only)
+async def list_teacher_assignments(
+    db: AsyncSession = Depends(get_async_db),
+    teacher=Depends(teacher_only_async)
 ):
-    assignments = db.query(Assignment).filter(
-        Assignment.teacher_id == teacher.id
-    ).order_by(Assignment.created_at.desc()).all()
+    assignments = (
+        await db.execute(
+            select(
+                Assignment.id,
+                Assignment.subject,
+                Assignment.year,
+                Assignment.title,
+                Assignment.due_date,
+                Assignment.created_at
+            )
+            .where(Assignment.teacher_id == teacher.id)
+            .order_by(Assignment.created_at.desc())
+        )
+    ).all()
 
     return [
         {
@@ -4,7 +4,7 @@ from sqlalchemy import func
 from datetime import date
 import csv, io
 
-from database import get_db
+from database import get_read_db
 from models import Attendance, User, TeacherSubject
 from check_user import teacher_only
 from fastapi.responses import StreamingResponse
@@ -31,6 +31,8 @@ def verify_teacher_subject(db, teacher, subject, year):
             detail="Not authorized for this subject"
         )
 
+    return assignment
+
 # -------------------------------------------------
 # SUBJECT HISTORY (DATE + PRESENT COUNT)
 # -------------------------------------------------
@@ -38,10 +40,10 @@ def verify_teacher_subject(db, teacher, subject, year):
 def history_by_subject(
     subject: str,
     year: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     teacher=Depends(teacher_only)
 ):
-    verify_teacher_subject(db, teacher, subject, year)
+    assignment = verify_teacher_subject(db, teacher, subject, year)
 
     records = (
         db.query(
@@ -50,7 +52,7 @@ def history_by_subject(
         )
         .join(User, User.id == Attendance.student_id)
         .filter(
-            Attendance.subject == subject,
+            Attendance.subject_id == assignment.subject_id,
             Attendance.status == "present",
             User.branch == teacher.branch,
             User.year == year
@@ -76,16 +78,16 @@ def history_by_date(
     subject: str,
     year: str,
     attendance_date: date,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     teacher=Depends(teacher_only)
 ):
-    verify_teacher_subject(db, teacher, subject, year)
+    assignment = verify_teacher_subject(db, teacher, subject, year)
 
     records = (
         db.query(User.id, User.name, Attendance.status)
         .join(Attendance, Attendance.student_id == User.id)
         .filter(
-            Attendance.subject == subject,
+            Attendance.subject_id == assignment.subject_id,
             Attendance.date == attendance_date,
             User.branch == teacher.branch,
             User.year == year
@@ -111,22 +113,21 @@ def export_attendance_csv(
     subject: str,
     year: str,
     attendance_date: date,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     teacher=Depends(teacher_only)
 ):
-    verify_teacher_subject(db, teacher, subject, year)
+    assignment = verify_teacher_subject(db, teacher, subject, year)
 
     records = (
         db.query(
             User.name,
             User.mobile,
-            Attendance.subject,
             Attendance.date,
             Attendance.status
         )
         .join(User, User.id == Attendance.student_id)
         .filter(
-            Attendance.subject == subject,
+            Attendance.subject_id == assignment.subject_id,
             Attendance.date == attendance_date,
             User.branch == teacher.branch,
             User.year == year
@@ -144,7 +145,7 @@ def export_attendance_csv(
     writer.writerow(["Student Name", "Mobile", "Subject", "Date", "Status"])
 
     for r in records:
-        writer.writerow([r.name, r.mobile, r.subject, r.date, r.status])
+        writer.writerow([r.name, r.mobile, subject, r.date, r.status])
 
     output.seek(0)
 
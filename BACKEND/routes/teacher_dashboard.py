@@ -12,6 +12,7 @@ from models import (
     User
 )
 from check_user import teacher_only
+from roster_cache import roster_cache
 
 router = APIRouter(
     prefix="/teacher/dashboard",
@@ -42,14 +43,7 @@ def teacher_dashboard_root(
         .scalar()
     ) or 0
 
-    total_students = (
-        db.query(func.count(User.id))
-        .filter(
-            User.role == "student",
-            User.branch == teacher.branch
-        )
-        .scalar()
-    ) or 0
+    total_students = len(roster_cache.get(db, teacher.branch))
 
     attendance = {
         "active": False,          # you can update later
@@ -80,11 +74,7 @@ def teacher_dashboard_root(
             elif a.due_date < now:
                 assignment_summary["overdue"] += 1
 
-        total_students = db.query(User).filter(
-            User.role == "student",
-            User.branch == a.branch,
-            User.year == a.year
-        ).count()
+        total_students = len(roster_cache.get(db, a.branch, a.year))
 
         submitted = db.query(AssignmentSubmission).filter(
             AssignmentSubmission.assignment_id == a.id
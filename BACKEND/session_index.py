@@ -0,0 +1,191 @@
+"""
+Process-local index of active attendance sessions keyed by digit code
+(and by session id, for rotating-code sessions that have no stored code).
+
+start_attendance adds the new session (and drops the teacher's previous
+ones), mark_attendance validates against it without touching
+attendance_sessions, and startup rebuilds it from the database. Codes are
+reserved while a session is being created so two active sessions never
+share one.
+
+Session ids are only unique within a shard (DB_SHARDS gives every branch
+shard its own attendance_sessions), so lookups by id take the branch and
+key on (shard, session_id).
+
+A miss is not final: with several workers a session may have been started
+elsewhere, so callers fall back to the database and `add` what they find.
+"""
+import secrets
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from database import shard_for
+from models import AttendanceSession
+from sharding import for_each_shard
+
+CODE_ATTEMPTS = 20
+
+
+def session_key(branch: str | None, session_id: int) -> tuple[str | None, int]:
+    return (shard_for(branch), session_id)
+
+
+@dataclass(frozen=True)
+class ActiveSession:
+    session_id: int
+    teacher_id: int
+    session_code: str
+    digit_code: str | None
+    subject: str
+    subject_id: int | None
+    branch: str
+    year: str
+    expires_at: datetime
+
+    @property
+    def key(self) -> tuple[str | None, int]:
+        return session_key(self.branch, self.session_id)
+
+    def expired(self, now: datetime | None = None) -> bool:
+        return self.expires_at < (now or datetime.utcnow())
+
+    @classmethod
+    def from_row(cls, s: AttendanceSession) -> "ActiveSession":
+        return cls(
+            session_id=s.id,
+            teacher_id=s.teacher_id,
+            session_code=s.session_code,
+            digit_code=s.digit_code,
+            subject=s.subject,
+            subject_id=s.subject_id,
+            branch=s.branch,
+            year=str(s.year),
+            expires_at=s.expires_at,
+        )
+
+
+class ActiveSessionIndex:
+    def __init__(self):
+        self._by_code: dict[str, ActiveSession] = {}
+        self._by_id: dict[tuple[str | None, int], ActiveSession] = {}
+        self._by_session_code: dict[str, ActiveSession] = {}
+        self._reserved: set[str] = set()
+        self._lock = threading.Lock()
+
+    def get(self, digit_code: str) -> ActiveSession | None:
+        return self._by_code.get(digit_code)
+
+    def get_session(self, branch: str | None, session_id: int) -> ActiveSession | None:
+        return self._by_id.get(session_key(branch, session_id))
+
+    def get_by_session_code(self, session_code: str) -> ActiveSession | None:
+        return self._by_session_code.get(session_code)
+
+    def add(self, entry: ActiveSession):
+        with self._lock:
+            self._by_id[entry.key] = entry
+            self._by_session_code[entry.session_code] = entry
+            if entry.digit_code is not None:
+                self._reserved.discard(entry.digit_code)
+                self._by_code[entry.digit_code] = entry
+
+    def _drop(self, entry: ActiveSession):
+        # caller holds the lock
+        self._by_id.pop(entry.key, None)
+        self._by_session_code.pop(entry.session_code, None)
+        if entry.digit_code is not None:
+            self._by_code.pop(entry.digit_code, None)
+
+    def reserve(self, digit_code: str) -> bool:
+        with self._lock:
+            if digit_code in self._by_code or digit_code in self._reserved:
+                return False
+            self._reserved.add(digit_code)
+            return True
+
+    def release(self, digit_code: str):
+        with self._lock:
+            self._reserved.discard(digit_code)
+
+    def evict(self, branch: str | None, session_id: int):
+        with self._lock:
+            entry = self._by_id.get(session_key(branch, session_id))
+            if entry is not None:
+                self._drop(entry)
+
+    def evict_teacher(self, teacher_id: int):
+        with self._lock:
+            for entry in list(self._by_id.values()):
+                if entry.teacher_id == teacher_id:
+                    self._drop(entry)
+
+    def sweep(self) -> int:
+        now = datetime.utcnow()
+        with self._lock:
+            expired = [e for e in self._by_id.values() if e.expired(now)]
+            for entry in expired:
+                self._drop(entry)
+        return len(expired)
+
+    def active(self) -> list[ActiveSession]:
+        return list(self._by_id.values())
+
+    def clear(self):
+        with self._lock:
+            self._by_code.clear()
+            self._by_id.clear()
+            self._by_session_code.clear()
+            self._reserved.clear()
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+
+active_sessions = ActiveSessionIndex()
+
+
+def issue_digit_code(db: Session) -> str:
+    """
+    Reserve a 6-digit code no active session uses (here or in the database).
+    Release it with `active_sessions.release` if the session is not created.
+    """
+    active_sessions.sweep()
+
+    for _ in range(CODE_ATTEMPTS):
+        code = str(secrets.randbelow(900000) + 100000)
+        if not active_sessions.reserve(code):
+            continue
+
+        taken = db.query(AttendanceSession.id).filter(
+            AttendanceSession.digit_code == code,
+            AttendanceSession.is_active == True
+        ).first()
+        if taken is None:
+            return code
+
+        active_sessions.release(code)
+
+    raise HTTPException(
+        status_code=503,
+        detail="Could not allocate an attendance code, try again"
+    )
+
+
+def rebuild():
+    """
+    Reload every active session (all shards) into the index; run after the
+    expiry scheduler has closed sessions that lapsed during downtime.
+    """
+    def load(db: Session):
+        return db.query(AttendanceSession).filter(
+            AttendanceSession.is_active == True
+        ).all()
+
+    active_sessions.clear()
+    for rows in for_each_shard(load):
+        for s in rows:
+            active_sessions.add(ActiveSession.from_row(s))
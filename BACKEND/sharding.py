@@ -0,0 +1,179 @@
+"""
+Per-branch shards (DB_SHARDS) — schema setup, admin fan-out and data split.
+
+    python sharding.py status
+    python sharding.py split      # move branch rows from the global db into shards
+
+Routing itself lives in database.py (BranchRoutedSession); this module
+holds the pieces that need the models.
+"""
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from database import (
+    DB_SHARDS,
+    SHARDED_TABLES,
+    Base,
+    SessionLocal,
+    engine,
+    route_to_branch,
+    shard_engines,
+)
+from models import (
+    Assignment,
+    AssignmentSubmission,
+    Attendance,
+    AttendanceSession,
+    Branch,
+    Class,
+    Notes,
+    Subject,
+    TeacherSubject,
+    User,
+)
+
+T = TypeVar("T")
+
+SHARD_FANOUT_WORKERS = int(os.getenv("SHARD_FANOUT_WORKERS", "8"))
+
+_fan_out: ThreadPoolExecutor | None = None
+
+
+def create_shard_schemas():
+    # shards hold only the branch tables; `users` resolves to the attached global db
+    tables = [t for name, t in Base.metadata.tables.items() if name in SHARDED_TABLES]
+    for shard in shard_engines.values():
+        Base.metadata.create_all(bind=shard, tables=tables)
+
+
+def for_each_shard(fn: Callable[[Session], T]) -> list[T]:
+    """
+    Run fn(session) against every database that holds branch data — each
+    shard plus the global database — in parallel, one session each.
+    """
+    global _fan_out
+
+    def run(branch):
+        with SessionLocal() as db:
+            route_to_branch(db, branch)
+            return fn(db)
+
+    branches = [None, *DB_SHARDS]
+    if len(branches) == 1:
+        return [run(None)]
+
+    if _fan_out is None:
+        _fan_out = ThreadPoolExecutor(
+            max_workers=SHARD_FANOUT_WORKERS,
+            thread_name_prefix="shard-fanout"
+        )
+    return list(_fan_out.map(run, branches))
+
+
+def shutdown_fan_out():
+    global _fan_out
+    if _fan_out is not None:
+        _fan_out.shutdown(wait=False, cancel_futures=True)
+        _fan_out = None
+
+
+# =========================
+# SPLIT (GLOBAL → SHARDS)
+# =========================
+def _branch_rows(db: Session, branch: str) -> list[tuple[type, list]]:
+    """
+    Branch-owned rows in dependency order (lookups first).
+    """
+    student_ids = select(User.id).where(User.branch == branch)
+    assignment_ids = select(Assignment.id).where(Assignment.branch == branch)
+
+    return [
+        (Subject, db.query(Subject).all()),
+        (Branch, db.query(Branch).all()),
+        (Class, db.query(Class).all()),
+        (TeacherSubject, db.query(TeacherSubject).filter(TeacherSubject.branch == branch).all()),
+        (AttendanceSession, db.query(AttendanceSession).filter(AttendanceSession.branch == branch).all()),
+        (Attendance, db.query(Attendance).filter(Attendance.student_id.in_(student_ids)).all()),
+        (Notes, db.query(Notes).filter(Notes.branch == branch).all()),
+        (Assignment, db.query(Assignment).filter(Assignment.branch == branch).all()),
+        (AssignmentSubmission, db.query(AssignmentSubmission).filter(
+            AssignmentSubmission.assignment_id.in_(assignment_ids)
+        ).all()),
+    ]
+
+
+def _as_dict(row) -> dict:
+    return {c.key: getattr(row, c.key) for c in row.__table__.columns}
+
+
+def split():
+    """
+    Copy each sharded branch's rows into its shard (same ids), then delete
+    them from the global database. Lookup tables are copied, not moved.
+    """
+    create_shard_schemas()
+
+    for branch, shard in shard_engines.items():
+        with SessionLocal() as source, shard.begin() as target:
+            moved = {}
+            for model, rows in _branch_rows(source, branch):
+                table = model.__table__
+                existing = {r[0] for r in target.execute(select(table.c.id))}
+                values = [_as_dict(r) for r in rows if r.id not in existing]
+                if values:
+                    target.execute(table.insert(), values)
+                moved[model] = rows
+
+        # shard committed → drop the originals (children first)
+        with SessionLocal() as source:
+            for model in (AssignmentSubmission, Assignment, Notes, Attendance,
+                          AttendanceSession, TeacherSubject):
+                ids = [r.id for r in moved[model]]
+                if ids:
+                    source.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+            source.commit()
+
+        print(f"✅ {branch}: " + ", ".join(
+            f"{m.__tablename__}={len(rows)}" for m, rows in moved.items()
+            if m not in (Subject, Branch, Class)
+        ))
+
+
+def status():
+    if not DB_SHARDS:
+        print("ℹ️ DB_SHARDS not set — everything lives in", engine.url)
+        return
+
+    def counts(db: Session) -> tuple:
+        return (
+            db.info.get("branch") or "global",
+            db.scalar(select(func.count()).select_from(Attendance)),
+            db.scalar(select(func.count()).select_from(AttendanceSession)),
+        )
+
+    create_shard_schemas()
+    print(f"{'shard':<12}{'attendance':>12}{'sessions':>10}")
+    for name, attendance, sessions in for_each_shard(counts):
+        print(f"{name:<12}{attendance:>12}{sessions:>10}")
+    shutdown_fan_out()
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+
+    if command == "split" and DB_SHARDS:
+        split()
+    elif command == "status":
+        status()
+    else:
+        print(__doc__)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Per-request SQL accounting.
+
+Every statement executed on any engine (sync or async) is counted against
+the request it runs in. Slow statements are logged with their route, and
+identical statement shapes repeated within one request are flagged as a
+suspected N+1.
+
+    SQL_DEBUG_HEADERS=1      → X-DB-Queries / X-DB-Time-ms / X-DB-N-Plus-One
+    SLOW_QUERY_MS=200        → slow statement threshold
+    N_PLUS_ONE_THRESHOLD=5   → repeats of one shape that count as N+1
+"""
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SQL_DEBUG_HEADERS = os.getenv("SQL_DEBUG_HEADERS", "false").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
+
+class RequestSQLStats:
+    def __init__(self, scope: dict | None = None):
+        self.scope = scope or {}
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        if route is not None and hasattr(route, "path"):
+            return f"{self.scope.get('method', '')} {route.path}".strip()
+        return self.scope.get("path", "<no request>")
+
+    def suspected_n_plus_one(self) -> list[tuple[str, int]]:
+        return [
+            (statement, n) for statement, n in self.shapes.items()
+            if n >= N_PLUS_ONE_THRESHOLD
+        ]
+
+
+_current: ContextVar[RequestSQLStats | None] = ContextVar("request_sql_stats", default=None)
+_captures: list[list] = []
+
+
+# =========================
+# ENGINE HOOKS (ALL ENGINES)
+# =========================
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = _current.get()
+
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+        stats.shapes[statement] += 1
+
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        route = stats.route if stats else "<no request>"
+        print(f"🐢 SLOW SQL {elapsed * 1000:.1f} ms [{route}] {' '.join(statement.split())[:500]}")
+
+
+# =========================
+# ASGI MIDDLEWARE
+# =========================
+class SQLInstrumentationMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestSQLStats(scope)
+        token = _current.set(stats)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start" and SQL_DEBUG_HEADERS:
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-queries", str(stats.count).encode()))
+                headers.append((b"x-db-time-ms", f"{stats.seconds * 1000:.2f}".encode()))
+                headers.append((b"x-db-n-plus-one", str(len(stats.suspected_n_plus_one())).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current.reset(token)
+            _finish(stats)
+
+
+def _finish(stats: RequestSQLStats):
+    for statement, n in stats.suspected_n_plus_one():
+        print(f"🔁 SUSPECTED N+1 [{stats.route}] {n}x {' '.join(statement.split())[:300]}")
+
+    for captured in _captures:
+        captured.append(stats)
+
+
+# =========================
+# TEST HELPER
+# =========================
+@contextmanager
+def query_budget(max_queries: int):
+    """
+    Fail if any request made inside the block runs more than `max_queries`:
+
+        with query_budget(3):
+            client.get("/notes/student", headers=headers)
+    """
+    captured = []
+    _captures.append(captured)
+    try:
+        yield captured
+    finally:
+        _captures.remove(captured)
+
+    for stats in captured:
+        if stats.count > max_queries:
+            raise AssertionError(
+                f"{stats.route} ran {stats.count} queries (budget {max_queries})"
+            )
@@ -1,43 +1,105 @@
+import hmac
+import os
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from datetime import datetime, date
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, date, timedelta, timezone
+from typing import List
 from pydantic import BaseModel
 
-from database import get_db
-from models import AttendanceSession, Attendance
-from check_user import student_only
+from database import get_async_db
+from models import AttendanceSession
+from check_user import student_only_async
+from session_index import ActiveSession, active_sessions
+from rotating_codes import ATTENDANCE_CODE_STEP, verify_code
+from mark_buffer import MARK_BUFFER, mark_buffer
+from attendance_writer import attendance_row, write_attendance_async
+from attendance_feed import attendance_feed
 
 router = APIRouter(prefix="/student/attendance", tags=["Student Attendance"])
 
+# offline marks: how late a batch may arrive after the session closed.
+# Opt-in beyond one code step: every extra second is time a relayed code
+# stays usable (see sync_attendance)
+SYNC_GRACE_SECONDS = int(os.getenv("ATTENDANCE_SYNC_GRACE_SECONDS", str(ATTENDANCE_CODE_STEP)))
+SYNC_MAX_INTENTS = int(os.getenv("ATTENDANCE_SYNC_MAX_INTENTS", "50"))
+SYNC_CLOCK_SKEW = timedelta(seconds=30)
+
 
 class MarkAttendanceRequest(BaseModel):
     digit_code: str
+    session_id: int | None = None   # required for rotating codes
 
 
-@router.post("/mark")
-def mark_attendance(
-    data: MarkAttendanceRequest,
-    db: Session = Depends(get_db),
-    student=Depends(student_only)
-):
-    now = datetime.utcnow()
+def _publish_mark(session: ActiveSession, student):
+    # 📡 live feed for the teacher's open tabs
+    attendance_feed.publish(session.key, {
+        "event": "mark",
+        "student_id": student.id,
+        "name": student.name
+    })
+
 
-    session = (
-        db.query(AttendanceSession)
-        .filter(
-            AttendanceSession.digit_code == data.digit_code,
-            AttendanceSession.is_active == True,
+async def _load_session(db: AsyncSession, condition, now: datetime) -> ActiveSession:
+    # started by another worker (or before a restart) → look it up once
+    row = (
+        await db.execute(
+            select(AttendanceSession)
+            .where(
+                condition,
+                AttendanceSession.is_active == True,
+                AttendanceSession.expires_at > now
+            )
+            # a static code can be reissued before the old row is closed
+            .order_by(AttendanceSession.created_at.desc())
+            .limit(1)
         )
-        .first()
-    )
+    ).scalar()
 
-    if not session:
+    if not row:
         raise HTTPException(
             status_code=400,
             detail="Invalid attendance code"
         )
 
-    if session.expires_at < now:
+    session = ActiveSession.from_row(row)
+    if not session.expired(now):
+        active_sessions.add(session)
+    return session
+
+
+@router.post("/mark")
+async def mark_attendance(
+    data: MarkAttendanceRequest,
+    db: AsyncSession = Depends(get_async_db),
+    student=Depends(student_only_async)
+):
+    now = datetime.utcnow()
+
+    if data.session_id is not None:
+        # rotating code → the code is recomputed, never looked up
+        # session ids are per shard → look it up in the student's branch
+        session = active_sessions.get_session(student.branch, data.session_id)
+        if session is None:
+            session = await _load_session(db, AttendanceSession.id == data.session_id, now)
+
+        if session.digit_code is not None:
+            valid = hmac.compare_digest(session.digit_code.encode(), data.digit_code.encode())
+        else:
+            valid = verify_code(session.branch, session.session_id, data.digit_code)
+
+        if not valid:
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid attendance code"
+            )
+    else:
+        session = active_sessions.get(data.digit_code)
+        if session is None:
+            session = await _load_session(db, AttendanceSession.digit_code == data.digit_code, now)
+
+    if session.expired(now):
+        active_sessions.evict(session.branch, session.session_id)
         raise HTTPException(
             status_code=400,
             detail="Attendance session expired"
@@ -52,30 +114,184 @@ def mark_attendance(
 
     today = date.today()
 
-    existing = (
-        db.query(Attendance)
-        .filter(
-            Attendance.student_id == student.id,
-            Attendance.subject == session.subject,
-            Attendance.date == today
-        )
-        .first()
+    # write-behind: de-duplicated in memory, batched into one INSERT
+    if MARK_BUFFER:
+        # hand the pooled connection back while waiting for the batch
+        await db.close()
+
+        if not await mark_buffer.submit(student.id, session.subject_id, today, student.branch):
+            raise HTTPException(
+                status_code=400,
+                detail="Attendance already marked"
+            )
+
+        _publish_mark(session, student)
+        return {"message": "Attendance marked successfully"}
+
+    # one INSERT ... ON CONFLICT DO NOTHING; a skipped row is a duplicate
+    result = await write_attendance_async(
+        db, [attendance_row(student.id, session.subject_id, today)]
     )
+    await db.commit()
 
-    if existing:
+    if result.skipped:
         raise HTTPException(
             status_code=400,
             detail="Attendance already marked"
         )
 
-    attendance = Attendance(
-        student_id=student.id,
-        subject=session.subject,
-        date=today,
-        status="present"
-    )
+    _publish_mark(session, student)
+    return {"message": "Attendance marked successfully"}
 
-    db.add(attendance)
-    db.commit()
 
-    return {"message": "Attendance marked successfully"}
+# =========================
+# 📶 BATCH SYNC (OFFLINE / FLAKY WI-FI)
+# =========================
+class MarkIntent(BaseModel):
+    digit_code: str
+    captured_at: datetime           # when the student read the code
+    session_id: int | None = None   # required for rotating codes
+
+
+class SyncAttendanceRequest(BaseModel):
+    intents: List[MarkIntent]
+
+
+def _utc(moment: datetime) -> datetime:
+    # naive UTC like the session columns
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def _local_day(moment: datetime) -> date:
+    # what date.today() returned at that moment (the /mark convention)
+    return moment.replace(tzinfo=timezone.utc).astimezone().date()
+
+
+def _intent_session(intent: MarkIntent, captured_at: datetime, rows: list) -> AttendanceSession | None:
+    for row in rows:
+        if row.expires_at is None or row.created_at is None:
+            continue
+        if intent.session_id is not None:
+            if row.id == intent.session_id:
+                return row
+        elif row.digit_code == intent.digit_code and row.created_at - SYNC_CLOCK_SKEW <= captured_at <= row.expires_at:
+            # static codes are reused later → the one open at capture time
+            return row
+    return None
+
+
+def _check_intent(intent: MarkIntent, captured_at: datetime, row, student, now: datetime) -> str | None:
+    """
+    None if the intent is valid, else its per-item status.
+    """
+    if row is None:
+        return "invalid_code"
+
+    if captured_at > now + SYNC_CLOCK_SKEW or captured_at < row.created_at - SYNC_CLOCK_SKEW:
+        return "invalid_time"
+
+    if captured_at > row.expires_at or (now - row.expires_at).total_seconds() > SYNC_GRACE_SECONDS:
+        return "expired"
+
+    # a static code says nothing about when it was read → only while open
+    if row.digit_code is not None and (not row.is_active or now > row.expires_at):
+        return "expired"
+
+    # rotating codes are checked at the step of the claimed capture time
+    if row.digit_code is not None:
+        valid = hmac.compare_digest(row.digit_code.encode(), intent.digit_code.encode())
+    else:
+        valid = verify_code(row.branch, row.id, intent.digit_code, now=captured_at.replace(tzinfo=timezone.utc).timestamp())
+    if not valid:
+        return "invalid_code"
+
+    if student.branch != row.branch or student.year != row.year:
+        return "not_allowed"
+
+    return None
+
+
+@router.post("/sync")
+async def sync_attendance(
+    data: SyncAttendanceRequest,
+    db: AsyncSession = Depends(get_async_db),
+    student=Depends(student_only_async)
+):
+    """
+    Replay marks captured while offline: each intent is checked against the
+    session window as it was at `captured_at`, all valid ones are written in
+    one transaction, and every item gets a status. Replays are idempotent
+    (already_marked).
+
+    `captured_at` is the client's word, and nothing here proves the student
+    saw the code at that moment. A rotating code only shows that the code
+    belongs to the claimed step, so a classmate can relay it together with
+    its time. That keeps working for the rest of the session plus
+    ATTENDANCE_SYNC_GRACE_SECONDS, not the few seconds /mark allows. The
+    default grace is therefore one code step. Static-code intents are
+    refused once the session has closed.
+    """
+    if not data.intents:
+        return {"results": []}
+
+    if len(data.intents) > SYNC_MAX_INTENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {SYNC_MAX_INTENTS} intents per sync"
+        )
+
+    now = datetime.utcnow()
+    captured = [_utc(i.captured_at) for i in data.intents]
+
+    # one query for every referenced session (active or not)
+    ids = {i.session_id for i in data.intents if i.session_id is not None}
+    codes = {i.digit_code for i in data.intents if i.session_id is None}
+    rows = (
+        await db.execute(
+            select(AttendanceSession).where(
+                or_(AttendanceSession.id.in_(ids), AttendanceSession.digit_code.in_(codes))
+            )
+        )
+    ).scalars().all()
+
+    statuses: list[str | None] = []
+    sessions: list[AttendanceSession | None] = []
+    for intent, captured_at in zip(data.intents, captured):
+        row = _intent_session(intent, captured_at, rows)
+        sessions.append(row)
+        statuses.append(_check_intent(intent, captured_at, row, student, now))
+
+    keys = {}
+    for n, (row, captured_at) in enumerate(zip(sessions, captured)):
+        if statuses[n] is None:
+            keys[n] = (student.id, row.subject_id, _local_day(captured_at))
+
+    inserted = set()
+    if keys:
+        result = await write_attendance_async(
+            db, [attendance_row(*key) for key in keys.values()]
+        )
+        await db.commit()
+        inserted = set(result.inserted)
+
+    results = []
+    published = set()
+    for n, intent in enumerate(data.intents):
+        status = statuses[n]
+        if status is None:
+            key = keys[n]
+            # first intent for a new row is "marked", repeats of it are replays
+            status = "marked" if key in inserted and key not in published else "already_marked"
+            if status == "marked":
+                published.add(key)
+                _publish_mark(ActiveSession.from_row(sessions[n]), student)
+
+        results.append({
+            "session_id": sessions[n].id if sessions[n] else intent.session_id,
+            "captured_at": intent.captured_at,
+            "status": status
+        })
+
+    return {"results": results}
@@ -1,14 +1,22 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta,date
+from datetime import datetime, timedelta, timezone, date
 import uuid
 from pydantic import BaseModel
 from models import User,TeacherSubject,Attendance
 
-from database import get_db
+from database import get_db, get_async_db
 from models import AttendanceSession
-from check_user import teacher_only
-import random
+from check_user import teacher_only, teacher_only_async
+from attendance_feed import FEED_HEARTBEAT_SECONDS, attendance_feed, sse
+from lookups import subject_id, class_id
+from session_index import ActiveSession, active_sessions, issue_digit_code, session_key
+from attendance_cleanup import expiry_scheduler
+from rotating_codes import ATTENDANCE_CODE_MODE, ROTATING_CODES, current_code
 
 router = APIRouter(prefix="/teacher/attendance", tags=["Teacher Attendance"])
 
@@ -32,31 +40,88 @@ def start_attendance(
         AttendanceSession.is_active == True
     ).update({"is_active": False})
     db.commit()
+    for old in active_sessions.active():
+        if old.teacher_id == teacher_id:
+            attendance_feed.close(old.key, "replaced")
+    active_sessions.evict_teacher(teacher_id)
+
+    # rotating mode → nothing stored, the code is derived from the session id
+    digit_code = None if ROTATING_CODES else issue_digit_code(db)
 
     session = AttendanceSession(
         teacher_id=teacher_id,
         branch=branch,
-        year=data.year,
+        year=str(data.year),
         subject=data.subject,
+        subject_id=subject_id(db, data.subject, create=True),
+        class_id=class_id(db, branch, data.year, create=True),
         session_code=str(uuid.uuid4())[:8],
-        digit_code=str(random.randint(100000, 999999)),  # ✅ 6-digit
+        digit_code=digit_code,  # ✅ 6-digit, unique among active sessions (static mode)
         expires_at=datetime.utcnow() + timedelta(minutes=3),
         is_active=True
     )
 
-    db.add(session)
-    db.commit()
-    db.refresh(session)
+    try:
+        db.add(session)
+        db.commit()
+        db.refresh(session)
+    except Exception:
+        if digit_code:
+            active_sessions.release(digit_code)
+        raise
+
+    active_sessions.add(ActiveSession.from_row(session))
+    expiry_scheduler.schedule(session.id, branch, session.expires_at)
     print("🕒 SERVER UTC NOW:", datetime.utcnow())
     print("🕒 EXPIRES AT:", session.expires_at)
 
-    return {
+    response = {
         "session_id": session.id,
         "session_code": session.session_code,
         "digit_code": session.digit_code,     # ✅ RETURNED
-        "expires_at": session.expires_at
+        "expires_at": session.expires_at,
+        "code_mode": ATTENDANCE_CODE_MODE,
+        "qr_url": f"/attendance/qr/{session.session_code}?format=svg"
     }
 
+    if ROTATING_CODES:
+        rotating = current_code(branch, session.id)
+        response["digit_code"] = rotating["code"]
+        response["code_rotates_in"] = rotating["rotates_in"]
+        response["code_step_seconds"] = rotating["step_seconds"]
+
+    return response
+
+
+@router.get("/sessions/{session_id}/code")
+def get_current_code(
+    session_id: int,
+    db: Session = Depends(get_db),
+    teacher=Depends(teacher_only)
+):
+    """
+    Current rotating code for the teacher's screen (poll when it rotates).
+    """
+    session = active_sessions.get_session(teacher.branch, session_id)
+    if session is None:
+        row = db.query(AttendanceSession).filter(
+            AttendanceSession.id == session_id,
+            AttendanceSession.is_active == True
+        ).first()
+        session = ActiveSession.from_row(row) if row else None
+
+    if not session or session.teacher_id != teacher.id or session.expired():
+        raise HTTPException(
+            status_code=404,
+            detail="No active attendance session"
+        )
+
+    if session.digit_code is not None:
+        # started in static mode → the code never changes
+        return {"code": session.digit_code, "step_seconds": None, "rotates_in": None}
+
+    return current_code(session.branch, session.session_id)
+
 # teacher_attendance.py
 
 @router.get("/subjects")
@@ -99,10 +164,149 @@ def check_manual_attendance(
     db: Session = Depends(get_db),
     teacher=Depends(teacher_only)
 ):
-    exists = db.query(Attendance).filter(
-        Attendance.subject == subject,
-        Attendance.year == year,
-        Attendance.date == date
+    exists = db.query(Attendance.id).join(
+        User, User.id == Attendance.student_id
+    ).filter(
+        Attendance.subject_id == subject_id(db, subject),
+        Attendance.date == date,
+        User.branch == teacher.branch,
+        User.year == str(year)
     ).first() is not None
 
     return {"exists": exists}
+
+
+# =========================
+# 📡 LIVE ATTENDANCE
+# =========================
+def _session_day(session: AttendanceSession) -> date:
+    # marks are stamped with the server's local date.today()
+    return session.created_at.replace(tzinfo=timezone.utc).astimezone().date()
+
+
+def _present_students(session: AttendanceSession):
+    return (
+        select(User.id, User.name)
+        .join(Attendance, Attendance.student_id == User.id)
+        .where(
+            Attendance.subject_id == session.subject_id,
+            Attendance.date == _session_day(session),
+            Attendance.status == "present",
+            User.branch == session.branch,
+            User.year == session.year
+        )
+        .order_by(User.name)
+    )
+
+
+@router.get("/active")
+def get_active_session(
+    db: Session = Depends(get_db),
+    teacher=Depends(teacher_only)
+):
+    session = db.query(AttendanceSession).filter(
+        AttendanceSession.teacher_id == teacher.id,
+        AttendanceSession.is_active == True
+    ).order_by(AttendanceSession.created_at.desc()).first()
+
+    if not session:
+        raise HTTPException(
+            status_code=404,
+            detail="No active attendance session"
+        )
+
+    present_count = db.scalar(
+        select(func.count()).select_from(_present_students(session).subquery())
+    )
+
+    return {
+        "session_id": session.id,
+        "session_code": session.session_code,
+        "digit_code": session.digit_code or current_code(session.branch, session.id)["code"],
+        "subject": session.subject,
+        "year": session.year,
+        "expires_at": session.expires_at,
+        "present_count": present_count
+    }
+
+
+async def _feed_events(key: tuple, queue: asyncio.Queue, present: dict, expires_at: datetime):
+    session_id = key[1]
+    try:
+        yield sse("snapshot", {
+            "session_id": session_id,
+            "present_count": len(present),
+            "students": list(present.values()),
+            "expires_at": expires_at
+        })
+
+        while True:
+            remaining = (expires_at - datetime.utcnow()).total_seconds()
+            if remaining <= 0:
+                yield sse("expired", {"session_id": session_id, "present_count": len(present)})
+                return
+
+            try:
+                event = await asyncio.wait_for(
+                    queue.get(), timeout=min(remaining, FEED_HEARTBEAT_SECONDS)
+                )
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+
+            if event["event"] == "closed":
+                yield sse("closed", {"session_id": session_id, "reason": event["reason"]})
+                return
+
+            # a mark already in the snapshot can arrive again while subscribing
+            if event["student_id"] in present:
+                continue
+
+            present[event["student_id"]] = event["name"]
+            yield sse("mark", {
+                "student_id": event["student_id"],
+                "name": event["name"],
+                "present_count": len(present)
+            })
+
+    finally:
+        attendance_feed.unsubscribe(key, queue)
+
+
+@router.get("/sessions/{session_id}/stream")
+async def stream_attendance(
+    session_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    teacher=Depends(teacher_only_async)
+):
+    """
+    Server-Sent Events: `snapshot`, then one `mark` per student as marks
+    commit, ending with `expired` (countdown reached) or `closed`.
+    """
+    session = await db.get(AttendanceSession, session_id)
+
+    if not session or session.teacher_id != teacher.id:
+        raise HTTPException(
+            status_code=404,
+            detail="Attendance session not found"
+        )
+
+    # subscribe before the snapshot so no mark falls in between
+    key = session_key(session.branch, session.id)
+    queue = attendance_feed.subscribe(key)
+    try:
+        present = dict((await db.execute(_present_students(session))).all())
+    except Exception:
+        attendance_feed.unsubscribe(key, queue)
+        raise
+
+    expires_at = session.expires_at if session.is_active else datetime.utcnow()
+
+    # the stream can stay open for minutes → don't hold a pooled connection
+    await db.close()
+
+    return StreamingResponse(
+        _feed_events(key, queue, present, expires_at),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
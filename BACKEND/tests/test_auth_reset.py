@@ -0,0 +1,51 @@
+import auth
+from otp_store import otp_store
+
+ADMIN_MOBILE = "9999999999"   # default admin created at startup
+
+
+def _otp(client, mobile, monkeypatch):
+    monkeypatch.setattr(auth, "DEV_OTP_ECHO", True)
+    r = client.post("/auth/send-otp", json={"mobile": mobile})
+    assert r.status_code == 200
+    return r.json()["otp"]
+
+
+def test_send_otp_does_not_echo_by_default(client):
+    r = client.post("/auth/send-otp", json={"mobile": "5550000001"})
+
+    assert r.status_code == 200
+    assert "otp" not in r.json()
+
+
+def test_admin_cannot_be_reset_by_otp(client, monkeypatch):
+    otp = _otp(client, ADMIN_MOBILE, monkeypatch)
+
+    r = client.post("/auth/reset-password", json={
+        "mobile": ADMIN_MOBILE, "otp": otp, "new_password": "pwned"
+    })
+    assert r.status_code == 403
+
+    assert client.post("/token", json={"mobile": ADMIN_MOBILE, "password": "pwned"}).status_code == 401
+    assert client.post("/token", json={"mobile": ADMIN_MOBILE, "password": "admin123"}).status_code == 200
+    otp_store.delete(ADMIN_MOBILE)
+
+
+def test_student_can_reset_by_otp(client, monkeypatch):
+    from database import SessionLocal
+    from models import User
+    from utils import get_password_hash
+
+    mobile = "5550000002"
+    with SessionLocal() as db:
+        db.add(User(
+            mobile=mobile, hashed_password=get_password_hash("old"), name="S",
+            dob="2005-01-01", gender="Other", branch="BCA", year="1", role="student"
+        ))
+        db.commit()
+
+    otp = _otp(client, mobile, monkeypatch)
+    r = client.post("/auth/reset-password", json={"mobile": mobile, "otp": otp, "new_password": "new"})
+
+    assert r.status_code == 200
+    assert client.post("/token", json={"mobile": mobile, "password": "new"}).status_code == 200
@@ -1,7 +1,14 @@
+import hashlib
+import json
+import os
+import time
 from datetime import datetime, timedelta
 from jose import jwt
 from passlib.context import CryptContext
 
+from metrics import hash_latency
+from ttl_cache import TTLCache
+
 # -----------------------------------
 # JWT CONFIG
 # -----------------------------------
@@ -12,17 +19,63 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 1 day
 # -----------------------------------
 # PASSWORD HASHING
 # -----------------------------------
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Cost comes from BCRYPT_ROUNDS, else from `python calibrate_hash.py`,
+# else passlib's default. Hashes at any other cost get rehashed on login.
+HASH_COST_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hash_cost.json")
+
+
+def load_bcrypt_rounds() -> int:
+    if os.getenv("BCRYPT_ROUNDS"):
+        return int(os.getenv("BCRYPT_ROUNDS"))
+
+    if os.path.exists(HASH_COST_FILE):
+        with open(HASH_COST_FILE) as f:
+            return int(json.load(f)["bcrypt_rounds"])
+
+    return 12
+
+
+BCRYPT_ROUNDS = load_bcrypt_rounds()
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+
+def hash_password_timed(password: str) -> tuple[str, float]:
+    """
+    (hash, seconds). For process-pool workers, whose metrics never reach
+    the parent: the caller records the timing.
+    """
+    started = time.perf_counter()
+    hashed = pwd_context.hash(password)
+    return hashed, time.perf_counter() - started
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    hashed, seconds = hash_password_timed(password)
+    hash_latency.record(seconds)
+    return hashed
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str):
+    """
+    Returns (ok, new_hash, seconds); new_hash is set when the stored cost is
+    outdated, seconds is the bcrypt time alone (runs in a pool worker).
+    """
+    started = time.perf_counter()
+    ok, new_hash = pwd_context.verify_and_update(plain_password, hashed_password)
+    return ok, new_hash, time.perf_counter() - started
+
+
 # -----------------------------------
 # TOKEN CREATION
 # -----------------------------------
@@ -31,3 +84,47 @@ def create_access_token(data: dict):
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+
+# -----------------------------------
+# TOKEN DECODING (VERIFIED PAYLOAD CACHE)
+# -----------------------------------
+# Keyed by a digest of the token; each entry lives until the token's `exp`,
+# so a cached payload is never served for an expired token.
+token_cache = TTLCache(
+    maxsize=int(os.getenv("TOKEN_CACHE_SIZE", "10000")),
+    ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+)
+
+
+def decode_access_token(token: str) -> dict:
+    """
+    Verify a JWT and return its payload. Raises JWTError like jwt.decode.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+
+    payload = token_cache.get(key)
+    if payload is not None:
+        return payload
+
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+    exp = payload.get("exp")
+    ttl = exp - time.time() if exp is not None else None
+    token_cache.set(key, payload, ttl=ttl)
+
+    return payload
+
+
+def user_token_claims(user) -> dict:
+    """
+    Signed claims trusted by the role guards in claims mode.
+    """
+    return {
+        "user_id": user.id,
+        "role": user.role,
+        "branch": user.branch,
+        "year": user.year,
+        "name": user.name,
+        "ver": user.token_version or 0
+    }